@@ -4,16 +4,49 @@ from flask_jwt_extended import (
     JWTManager, create_access_token, jwt_required, get_jwt_identity, get_jwt, verify_jwt_in_request
 )
 from cache import cache
+from config import configure_database
+from papers import get_quiz_paper, get_answer_key, grade_answers, get_score_review, quiz_tag, GradingError
+from catalogue import (
+    SUBJECTS_TAG, CHAPTERS_TAG, QUIZZES_TAG, QUESTIONS_TAG, OPTIONS_TAG, subject_tag, chapter_tag,
+    conditional, cached_response, cache_stats, dependents_of_subject, dependents_of_chapters,
+    subjects_changed, chapters_changed, quizzes_changed, questions_changed, options_changed
+)
+from submissions import (
+    enqueue_submission, get_submission, new_submission_key, should_schedule_flush, FLUSH_DEBOUNCE
+)
 from werkzeug.security import generate_password_hash, check_password_hash
 from functools import wraps
-
-from models import db, User, Subject, Chapter, Quiz, Question, Option, Score, UserAnswer
+import os
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload, contains_eager, selectinload
+from sqlalchemy.exc import IntegrityError
+
+from models import (
+    db, User, Subject, Chapter, Quiz, Question, Option, Score, UserAnswer, MonthlyActivity,
+    DailyRegistrations, WeeklyAttempts, UserScoreAverage
+)
+from migrations import run_migrations
+from pagination import list_response
+from rollups import (
+    record_attempts, record_registration, attempts_for_quizzes, forget_attempts, forget_user
+)
+from search import search, clamp_limit, SEARCH_LIMIT
+from typeahead import typeahead, publish_user_change, publish_user_delete, TYPEAHEAD_LIMIT
+from history import get_history, append_scores, drop_history, histories_changed, forget_histories
+from bulk_import import BulkImportError, parse_upload, validate, import_quizzes
+from leaderboard import (
+    top, rank_of, record_scores, boards_for_quizzes, forget_quizzes, boards_of_user, forget_user_boards,
+    LEADERBOARD_LIMIT, MAX_LEADERBOARD_LIMIT, LEADERBOARD_SCOPES
+)
 
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///database.db'
+configure_database(app)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = 'super-secret'
 app.config['JWT_SECRET_KEY'] = 'jwt-secret-string'
+# Grade on the request and persist through the ingestion queue (see
+# celery_app.ingest_submissions) instead of committing inline.
+app.config['ASYNC_SUBMISSIONS'] = os.environ.get('ASYNC_SUBMISSIONS', '0') == '1'
 
 db.init_app(app)
 cache.init_app(app) 
@@ -23,7 +56,7 @@ CORS(app, origins=[
     "http://127.0.0.1:5173",
     "http://localhost:5000",
     "http://127.0.0.1:5000"
-], supports_credentials=True)
+], supports_credentials=True, expose_headers=['X-Next-Cursor', 'X-Total-Count'])
 
 jwt = JWTManager(app)
 
@@ -42,14 +75,18 @@ def admin_required(fn):
 def setup_db():
     with app.app_context():
         db.create_all()
+        run_migrations()
         if not User.query.filter_by(email="admin@gmail.com").first():
-            db.session.add(User(
+            admin = User(
                 email="admin@gmail.com",
                 password=generate_password_hash("admin123"),
                 full_name="Admin",
                 qualification="NA",
-                role="admin"
-            ))
+                role="admin",
+                created_at=datetime.utcnow()
+            )
+            db.session.add(admin)
+            record_registration(admin.created_at)
             db.session.commit()
 
 
@@ -83,24 +120,25 @@ def signup():
         return jsonify({'msg': 'Email already exists'}), 409
     hashed_pw = generate_password_hash(password)
     user = User(email=email, password=hashed_pw, full_name=full_name,
-                qualification=qualification, role='user')
+                qualification=qualification, role='user', created_at=datetime.utcnow())
     db.session.add(user)
+    record_registration(user.created_at)
     db.session.commit()
+    publish_user_change(user)
     return jsonify({'msg': 'Signup successful!'}), 201
 
 
 @app.route('/api/admin/subjects', methods=['GET', 'OPTIONS'])
 @jwt_required()
 @admin_required
-#@cache.cached(timeout=20, key_prefix='admin_subjects')  # Cache for 5 minutes
 def get_subjects():
     if request.method == 'OPTIONS':
         return '', 200
-    subjects = Subject.query.all()
-    return jsonify([
-        {'id': s.id, 'name': s.name, 'description': s.description}
-        for s in subjects
-    ])
+    return cached_response('admin_subjects', [SUBJECTS_TAG], lambda: list_response(
+        Subject.query, Subject,
+        lambda s: {'id': s.id, 'name': s.name, 'description': s.description},
+        sortable={'id': Subject.id, 'name': Subject.name}
+    ))
 
 @app.route('/api/admin/subjects', methods=['POST'])
 @jwt_required()
@@ -114,10 +152,7 @@ def post_subject():
     subject = Subject(name=name, description=description)
     db.session.add(subject)
     db.session.commit()
-    
-   
-    cache.delete('flask_cache_admin_subjects')
-    
+    subjects_changed(subject.id)
     return jsonify({'msg': 'Subject added', 'id': subject.id}), 201
 
 
@@ -137,19 +172,20 @@ def subject_update_delete(subject_id):
         subject.name = data.get('name', subject.name)
         subject.description = data.get('description', subject.description)
         db.session.commit()
-        
-        
-        cache.delete('flask_cache_admin_subjects')
-        
+        subjects_changed(subject_id)
         return jsonify({'msg': 'Subject updated'})
 
     elif request.method == 'DELETE':
+        chapter_ids, quiz_ids = dependents_of_subject(subject_id)
+        attempts = attempts_for_quizzes(quiz_ids)
+        boards = boards_for_quizzes(quiz_ids)
         db.session.delete(subject)
+        db.session.flush()
+        forget_attempts(attempts)
         db.session.commit()
-        
-        
-        cache.delete('flask_cache_admin_subjects')
-        
+        subjects_changed(subject_id, chapter_ids=chapter_ids, quiz_ids=quiz_ids)
+        forget_histories({a.user_id for a in attempts})
+        forget_quizzes(boards)
         return jsonify({'msg': 'Subject deleted'})
 
 @app.route('/api/admin/chapters', methods=['POST', 'OPTIONS'])
@@ -170,6 +206,7 @@ def create_chapter():
     chapter = Chapter(name=name, description=description, subject_id=subject_id)
     db.session.add(chapter)
     db.session.commit()
+    chapters_changed(chapter.id, subject_ids=[subject_id])
     return jsonify({'msg': 'Chapter created', 'id': chapter.id}), 201
 
 @app.route('/api/admin/chapters', methods=['GET', 'OPTIONS'])
@@ -179,17 +216,18 @@ def get_all_chapters():
     if request.method == 'OPTIONS':
         return '', 200
 
-    chapters = Chapter.query.all()
-    return jsonify([
-        {
+    return cached_response('admin_chapters', [CHAPTERS_TAG], lambda: list_response(
+        Chapter.query.options(joinedload(Chapter.subject)), Chapter,
+        lambda c: {
             'id': c.id,
             'name': c.name,
             'description': c.description,
             'subject_id': c.subject_id,
             'subject_name': c.subject.name if c.subject else ""
-        }
-        for c in chapters
-    ])
+        },
+        sortable={'id': Chapter.id, 'name': Chapter.name},
+        filterable={'subject_id': Chapter.subject_id}
+    ))
 
 
 
@@ -202,16 +240,26 @@ def chapter_update_delete(chapter_id):
     chapter = Chapter.query.get(chapter_id)
     if not chapter:
         return jsonify({'msg': 'Chapter not found'}), 404
+    old_subject_id = chapter.subject_id
     if request.method == 'PUT':
         data = request.get_json()
         chapter.name = data.get('name', chapter.name)
         chapter.description = data.get('description', chapter.description)
         chapter.subject_id = data.get('subject_id', chapter.subject_id)
         db.session.commit()
+        chapters_changed(chapter_id, subject_ids=[old_subject_id, chapter.subject_id])
         return jsonify({'msg': 'Chapter updated'})
     elif request.method == 'DELETE':
+        quiz_ids = dependents_of_chapters(chapter_id)
+        attempts = attempts_for_quizzes(quiz_ids)
+        boards = boards_for_quizzes(quiz_ids)
         db.session.delete(chapter)
+        db.session.flush()
+        forget_attempts(attempts)
         db.session.commit()
+        chapters_changed(chapter_id, subject_ids=[old_subject_id], quiz_ids=quiz_ids)
+        forget_histories({a.user_id for a in attempts})
+        forget_quizzes(boards)
         return jsonify({'msg': 'Chapter deleted'})
 
 
@@ -225,18 +273,19 @@ def quizzes_handler():
         return '', 200
 
     if request.method == 'GET':
-        quizzes = Quiz.query.all()
-        return jsonify([
-            {
+        return cached_response('admin_quizzes', [QUIZZES_TAG], lambda: list_response(
+            Quiz.query.options(joinedload(Quiz.chapter)), Quiz,
+            lambda q: {
                 'id': q.id,
                 'date_of_quiz': q.date_of_quiz.isoformat() if q.date_of_quiz else None,
                 'time_duration': q.time_duration,
                 'remarks': q.remarks,
                 'chapter_id': q.chapter_id,
-                'chapter_name': q.chapter.name if hasattr(q, 'chapter') and q.chapter else ""
-            }
-            for q in quizzes
-        ])
+                'chapter_name': q.chapter.name if q.chapter else ""
+            },
+            sortable={'id': Quiz.id, 'date_of_quiz': Quiz.date_of_quiz},
+            filterable={'chapter_id': Quiz.chapter_id}
+        ))
 
     elif request.method == 'POST':
         data = request.get_json()
@@ -271,6 +320,7 @@ def quizzes_handler():
         )
         db.session.add(quiz)
         db.session.commit()
+        quizzes_changed(quiz.id, chapter_ids=[chapter_id])
         return jsonify({'msg': 'Quiz added', 'id': quiz.id}), 201
 
 @app.route('/api/admin/quizzes/<int:quiz_id>', methods=['PUT', 'DELETE', 'OPTIONS'])
@@ -284,6 +334,8 @@ def quiz_update_delete(quiz_id):
     if not quiz:
         return jsonify({'msg': 'Quiz not found'}), 404
 
+    old_chapter_id = quiz.chapter_id
+
     if request.method == 'PUT':
         data = request.get_json()
         if 'chapter_id' in data:
@@ -301,17 +353,74 @@ def quiz_update_delete(quiz_id):
                 return jsonify({'msg': f'Invalid date format: {e}'}), 400
         if 'time_duration' in data:
             quiz.time_duration = data['time_duration']
+        renamed = 'remarks' in data and data['remarks'] != quiz.remarks
         if 'remarks' in data:
             quiz.remarks = data['remarks']
         db.session.commit()
+        quizzes_changed(quiz_id, chapter_ids=[old_chapter_id, quiz.chapter_id])
+        if renamed:
+            # Histories embed the quiz name.
+            histories_changed()
         return jsonify({'msg': 'Quiz updated'})
 
     elif request.method == 'DELETE':
+        attempts = attempts_for_quizzes([quiz_id])
+        boards = boards_for_quizzes([quiz_id])
         db.session.delete(quiz)
+        db.session.flush()
+        forget_attempts(attempts)
         db.session.commit()
+        quizzes_changed(quiz_id, chapter_ids=[old_chapter_id])
+        forget_histories({a.user_id for a in attempts})
+        forget_quizzes(boards)
         return jsonify({'msg': 'Quiz deleted'})
 
 
+@app.route('/api/admin/quizzes/import', methods=['POST', 'OPTIONS'])
+@jwt_required()
+@admin_required
+def quizzes_import():
+    """
+    Create whole quizzes (or add questions to existing ones) from a JSON
+    body or an uploaded .json/.csv file. Everything is validated first and
+    written in one transaction; ?dry_run=1 only validates.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    try:
+        quizzes = parse_upload(request)
+        validate(quizzes)
+    except BulkImportError as e:
+        return jsonify({'msg': 'Import failed validation', 'errors': e.errors}), 400
+
+    question_count = sum(len(q['questions']) for q in quizzes)
+    option_count = sum(len(question['options']) for q in quizzes for question in q['questions'])
+    if request.args.get('dry_run') == '1':
+        return jsonify({'msg': 'Import is valid', 'quizzes': len(quizzes),
+                        'questions': question_count, 'options': option_count}), 200
+
+    existing = {q['quiz_id'] for q in quizzes if q['quiz_id'] is not None}
+    try:
+        quiz_ids = import_quizzes(quizzes)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    created = [i for i in quiz_ids if i not in existing]
+    if created:
+        quizzes_changed(*created, chapter_ids={q['chapter_id'] for q in quizzes})
+    questions_changed(*quiz_ids)
+    options_changed(*quiz_ids)
+    return jsonify({
+        'msg': 'Import complete',
+        'quiz_ids': quiz_ids,
+        'questions': question_count,
+        'options': option_count
+    }), 201
+
+
 
 
 @app.route('/api/admin/questions', methods=['GET', 'POST', 'OPTIONS'])
@@ -322,16 +431,18 @@ def questions_handler():
         return '', 200
 
     if request.method == 'GET':
-        questions = Question.query.all()
-        return jsonify([
-            {
+        return cached_response('admin_questions', [QUESTIONS_TAG], lambda: list_response(
+            Question.query.options(joinedload(Question.quiz)), Question,
+            lambda q: {
                 'id': q.id,
                 'quiz_id': q.quiz_id,
                 'question_statement': q.question_statement,
                 'quiz_name': q.quiz.remarks if q.quiz else "",
-            }
-            for q in questions
-        ])
+            },
+            sortable={'id': Question.id},
+            filterable={'quiz_id': Question.quiz_id},
+            export=('questions', ['id', 'quiz_id', 'question_statement', 'quiz_name'])
+        ))
 
     elif request.method == 'POST':
         data = request.get_json()
@@ -345,6 +456,7 @@ def questions_handler():
         )
         db.session.add(question)
         db.session.commit()
+        questions_changed(question.quiz_id)
         return jsonify({'msg': 'Question added', 'id': question.id}), 201
 
 @app.route('/api/admin/questions/<int:question_id>', methods=['PUT', 'DELETE', 'OPTIONS'])
@@ -358,19 +470,58 @@ def question_update_delete(question_id):
     if not question:
         return jsonify({'msg': 'Question not found'}), 404
 
+    old_quiz_id = question.quiz_id
+
     if request.method == 'PUT':
         data = request.get_json()
         question.quiz_id = data.get('quiz_id', question.quiz_id)
         question.question_statement = data.get('question_statement', question.question_statement)
         db.session.commit()
+        questions_changed(old_quiz_id, question.quiz_id)
         return jsonify({'msg': 'Question updated'})
 
     elif request.method == 'DELETE':
         db.session.delete(question)
         db.session.commit()
+        questions_changed(old_quiz_id)
         return jsonify({'msg': 'Question deleted'})
 
 
+@app.route('/api/admin/question_bank', methods=['GET', 'OPTIONS'])
+@jwt_required()
+@admin_required
+def admin_question_bank():
+    """
+    Questions with their options and quiz/chapter names embedded, filterable
+    by quiz, chapter or subject. Each page is three queries: the joined
+    question/quiz/chapter page, its options, and the optional count.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    return cached_response('admin_question_bank', [QUESTIONS_TAG, OPTIONS_TAG, QUIZZES_TAG], lambda: list_response(
+        Question.query.join(Question.quiz).join(Quiz.chapter).options(
+            contains_eager(Question.quiz).contains_eager(Quiz.chapter),
+            selectinload(Question.options)
+        ), Question,
+        lambda q: {
+            'id': q.id,
+            'quiz_id': q.quiz_id,
+            'question_statement': q.question_statement,
+            'quiz_name': q.quiz.remarks or "",
+            'chapter_id': q.quiz.chapter_id,
+            'chapter_name': q.quiz.chapter.name,
+            'subject_id': q.quiz.chapter.subject_id,
+            'options': [
+                {'id': o.id, 'question_id': o.question_id, 'text': o.text, 'is_correct': o.is_correct}
+                for o in sorted(q.options, key=lambda o: o.id)
+            ]
+        },
+        sortable={'id': Question.id},
+        filterable={'quiz_id': Question.quiz_id, 'chapter_id': Quiz.chapter_id, 'subject_id': Chapter.subject_id}
+    ))
+
+
 
 
 
@@ -382,20 +533,17 @@ def options_handler():
     if request.method == 'OPTIONS':
         return '', 200
     if request.method == 'GET':
-        question_id = request.args.get('question_id')
-        query = Option.query
-        if question_id:
-            query = query.filter_by(question_id=question_id)
-        options = query.all()
-        return jsonify([
-            {
+        return cached_response('admin_options', [OPTIONS_TAG], lambda: list_response(
+            Option.query, Option,
+            lambda o: {
                 'id': o.id,
                 'question_id': o.question_id,
                 'text': o.text,
                 'is_correct': o.is_correct
-            }
-            for o in options
-        ])
+            },
+            sortable={'id': Option.id},
+            filterable={'question_id': Option.question_id}
+        ))
     elif request.method == 'POST':
         data = request.get_json()
         question_id = data.get('question_id')
@@ -410,6 +558,7 @@ def options_handler():
         )
         db.session.add(option)
         db.session.commit()
+        options_changed(option.question.quiz_id if option.question else None)
         return jsonify({'msg': 'Option added', 'id': option.id}), 201
 
 @app.route('/api/admin/options/<int:option_id>', methods=['PUT', 'DELETE', 'OPTIONS'])
@@ -421,15 +570,18 @@ def option_update_delete(option_id):
     option = Option.query.get(option_id)
     if not option:
         return jsonify({'msg': 'Option not found'}), 404
+    quiz_id = option.question.quiz_id if option.question else None
     if request.method == 'PUT':
         data = request.get_json()
         option.text = data.get('text', option.text)
         option.is_correct = data.get('is_correct', option.is_correct)
         db.session.commit()
+        options_changed(quiz_id)
         return jsonify({'msg': 'Option updated'})
     elif request.method == 'DELETE':
         db.session.delete(option)
         db.session.commit()
+        options_changed(quiz_id)
         return jsonify({'msg': 'Option deleted'})
 
 
@@ -457,11 +609,10 @@ def user_dashboard():
 def user_subjects():
     if request.method == 'OPTIONS':
         return '', 200
-    subjects = Subject.query.all()
-    return jsonify([
+    return conditional(SUBJECTS_TAG, lambda: cached_response('user_subjects', [SUBJECTS_TAG], lambda: jsonify([
         {'id': s.id, 'name': s.name, 'description': s.description}
-        for s in subjects
-    ])
+        for s in Subject.query.all()
+    ])))
 
 
 @app.route('/api/user/chapters/<int:subject_id>', methods=['GET', 'OPTIONS'])
@@ -469,8 +620,8 @@ def user_subjects():
 def user_chapters(subject_id):
     if request.method == 'OPTIONS':
         return '', 200
-    chapters = Chapter.query.filter_by(subject_id=subject_id).all()
-    return jsonify([
+    tag = subject_tag(subject_id)
+    return conditional(tag, lambda: cached_response(f'user_chapters:{subject_id}', [tag], lambda: jsonify([
         {
             'id': c.id,
             'name': c.name,
@@ -478,8 +629,8 @@ def user_chapters(subject_id):
             'subject_id': c.subject_id,
             'subject_name': c.subject.name if c.subject else ""
         }
-        for c in chapters
-    ])
+        for c in Chapter.query.options(joinedload(Chapter.subject)).filter_by(subject_id=subject_id).all()
+    ])))
 
 
 @app.route('/api/user/quizzes/<int:chapter_id>', methods=['GET', 'OPTIONS'])
@@ -487,8 +638,8 @@ def user_chapters(subject_id):
 def user_quizzes(chapter_id):
     if request.method == 'OPTIONS':
         return '', 200
-    quizzes = Quiz.query.filter_by(chapter_id=chapter_id).all()
-    return jsonify([
+    tag = chapter_tag(chapter_id)
+    return conditional(tag, lambda: cached_response(f'user_quizzes:{chapter_id}', [tag], lambda: jsonify([
         {
             'id': q.id,
             'date_of_quiz': q.date_of_quiz.isoformat() if q.date_of_quiz else None,
@@ -497,31 +648,17 @@ def user_quizzes(chapter_id):
             'chapter_id': q.chapter_id,
             'chapter_name': q.chapter.name if q.chapter else ""
         }
-        for q in quizzes
-    ])
+        for q in Quiz.query.options(joinedload(Quiz.chapter)).filter_by(chapter_id=chapter_id).all()
+    ])))
 
 @app.route('/api/user/questions/<int:quiz_id>', methods=['GET', 'OPTIONS'])
 @jwt_required()
 def user_questions(quiz_id):
     if request.method == 'OPTIONS':
         return '', 200
-    questions = Question.query.filter_by(quiz_id=quiz_id).all()
-    results = []
-    for q in questions:
-        options = Option.query.filter_by(question_id=q.id).all()
-        results.append({
-            'id': q.id,
-            'quiz_id': q.quiz_id,
-            'question_statement': q.question_statement,
-            'options': [
-                {
-                    'id': o.id,
-                    'text': o.text,
-                    
-                } for o in options
-            ]
-        })
-    return jsonify(results)
+    return conditional(quiz_tag(quiz_id), lambda: app.response_class(
+        get_quiz_paper(quiz_id), mimetype='application/json'
+    ))
 
 
 @app.route('/api/user/submit_quiz', methods=['POST', 'OPTIONS'])
@@ -540,43 +677,61 @@ def user_submit_quiz():
     if answers is None:
         return jsonify({'msg': 'answers required'}), 400
 
-    
-    total_questions = 0
-    total_correct = 0
+    submission_key = data.get('submission_id') or request.headers.get('Idempotency-Key')
+    if submission_key:
+        existing = Score.query.filter_by(submission_key=submission_key, user_id=user_id).first()
+        if existing:
+            return jsonify({
+                'msg': 'Quiz already submitted',
+                'quiz_id': existing.quiz_id,
+                'submission_id': submission_key,
+                'score_id': existing.id,
+                'score': existing.total_scored
+            }), 200
+
+    try:
+        total_questions, total_correct, graded = grade_answers(get_answer_key(quiz_id), answers)
+    except GradingError as e:
+        return jsonify({'msg': str(e)}), 400
+    total_scored = (total_correct / total_questions) * 100 if total_questions > 0 else 0
+
+    if app.config['ASYNC_SUBMISSIONS']:
+        return submit_write_behind(submission_key or new_submission_key(), user_id, quiz_id,
+                                   total_questions, total_correct, total_scored, graded)
 
-    
     score = Score(
         quiz_id=quiz_id,
         user_id=user_id,
         timestamp=datetime.utcnow(),
-        total_scored=0.0 
+        total_scored=total_scored,
+        submission_key=submission_key
     )
-    db.session.add(score)
-    db.session.flush()  
-
-    for answer in answers:
-        question_id = answer.get('question_id')
-        selected_option_id = answer.get('selected_option_id')
-        if not question_id or not selected_option_id:
-            continue
-        option = Option.query.filter_by(id=selected_option_id, question_id=question_id).first()
-        if option and option.is_correct:
-            total_correct += 1
-        total_questions += 1
-        user_answer = UserAnswer(
-            score_id=score.id,
-            question_id=question_id,
-            selected_option_id=selected_option_id
-        )
-        db.session.add(user_answer)
-
-   
-    if total_questions > 0:
-        score.total_scored = (total_correct / total_questions) * 100
-    else:
-        score.total_scored = 0
-
-    db.session.commit()
+    try:
+        db.session.add(score)
+        # The unique submission_key is enforced here, on flush.
+        db.session.flush()
+        if graded:
+            db.session.execute(insert(UserAnswer), [
+                {'score_id': score.id, 'question_id': question_id, 'selected_option_id': option_id}
+                for question_id, option_id in graded
+            ])
+        record_attempts([(score.user_id, score.timestamp, score.total_scored)])
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent retry with the same submission_id won the race.
+        db.session.rollback()
+        existing = Score.query.filter_by(submission_key=submission_key, user_id=user_id).first()
+        if not submission_key or not existing:
+            raise
+        return jsonify({
+            'msg': 'Quiz already submitted',
+            'quiz_id': existing.quiz_id,
+            'submission_id': submission_key,
+            'score_id': existing.id,
+            'score': existing.total_scored
+        }), 200
+    append_scores([score])
+    record_scores([score])
 
     return jsonify({
         'msg': 'Quiz submitted successfully!',
@@ -587,22 +742,119 @@ def user_submit_quiz():
     }), 200
 
 
+def submit_write_behind(submission_key, user_id, quiz_id, total_questions, total_correct,
+                        total_scored, graded):
+    """
+    Return the score right away and hand persistence to the ingestion task.
+    """
+    from celery_app import ingest_submissions
+
+    accepted, status = enqueue_submission({
+        'submission_key': submission_key,
+        'user_id': int(user_id),
+        'quiz_id': int(quiz_id),
+        'timestamp': datetime.utcnow().isoformat(),
+        'total_questions': total_questions,
+        'correct_answers': total_correct,
+        'total_scored': total_scored,
+        'answers': graded
+    })
+    if accepted and should_schedule_flush():
+        ingest_submissions.apply_async(countdown=FLUSH_DEBOUNCE)
+
+    return jsonify({
+        'msg': 'Quiz submitted successfully!' if accepted else 'Quiz already submitted',
+        'quiz_id': status['quiz_id'],
+        'submission_id': submission_key,
+        'status': status['status'],
+        'total_questions': status['total_questions'],
+        'correct_answers': status['correct_answers'],
+        'score': status['total_scored']
+    }), 202
+
+
+@app.route('/api/user/submissions/<submission_id>', methods=['GET', 'OPTIONS'])
+@jwt_required()
+def user_submission_status(submission_id):
+    """
+    Let the client confirm that a write-behind submission is durable.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+    user_id = get_jwt_identity()
+    status = get_submission(user_id, submission_id)
+    if status and str(status.get('user_id')) == str(user_id):
+        return jsonify({
+            'submission_id': submission_id,
+            'status': status['status'],
+            'score_id': status.get('score_id'),
+            'score': status.get('total_scored')
+        }), 200
+
+    score = Score.query.filter_by(submission_key=submission_id, user_id=user_id).first()
+    if not score:
+        return jsonify({'msg': 'Not found'}), 404
+    return jsonify({
+        'submission_id': submission_id,
+        'status': 'stored',
+        'score_id': score.id,
+        'score': score.total_scored
+    }), 200
+
+
 @app.route('/api/user/scores', methods=['GET', 'OPTIONS'])
 @jwt_required()
 def user_scores():
     if request.method == 'OPTIONS':
         return '', 200
     user_id = get_jwt_identity()
-    scores = Score.query.filter_by(user_id=user_id).all()
-    return jsonify([
-        {
+    if request.args.to_dict() == {'all': '1'}:
+        # The full list is what the scores page asks for; serve it from the
+        # cached history instead of scanning Score.
+        return jsonify([
+            {'id': score_id, 'quiz_id': quiz_id, 'timestamp': timestamp, 'total_scored': total_scored}
+            for score_id, quiz_id, _, timestamp, total_scored in get_history(user_id)
+        ])
+    return list_response(
+        Score.query.filter_by(user_id=user_id), Score,
+        lambda s: {
             'id': s.id,
             'quiz_id': s.quiz_id,
             'timestamp': s.timestamp.isoformat() if s.timestamp else "",
             'total_scored': s.total_scored,
-        }
-        for s in scores
-    ])
+        },
+        sortable={'id': Score.id, 'timestamp': Score.timestamp},
+        filterable={'quiz_id': Score.quiz_id}
+    )
+
+
+@app.route('/api/user/leaderboard', methods=['GET', 'OPTIONS'])
+@jwt_required()
+def user_leaderboard():
+    """
+    Top scorers and the caller's own rank on the global board, or on a
+    chapter or quiz board with ?scope=chapter|quiz&id=<id>.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+    scope = request.args.get('scope', 'global')
+    board_id = request.args.get('id', type=int)
+    if scope not in LEADERBOARD_SCOPES:
+        return jsonify({'msg': f'Unknown scope {scope}'}), 400
+    if scope != 'global' and board_id is None:
+        return jsonify({'msg': 'id required'}), 400
+    try:
+        limit = int(request.args.get('limit', LEADERBOARD_LIMIT))
+    except ValueError:
+        return jsonify({'msg': 'Invalid limit'}), 400
+    limit = max(1, min(limit, MAX_LEADERBOARD_LIMIT))
+
+    return jsonify({
+        'scope': scope,
+        'id': board_id,
+        'top': top(scope, board_id, limit),
+        'me': rank_of(scope, board_id, get_jwt_identity())
+    }), 200
 
 
 @app.route('/api/user/score_details/<int:score_id>', methods=['GET', 'OPTIONS'])
@@ -610,28 +862,10 @@ def user_scores():
 def user_score_details(score_id):
     if request.method == 'OPTIONS':
         return '', 200
-    user_id = get_jwt_identity()
-    score = Score.query.filter_by(id=score_id, user_id=user_id).first()
-    if not score:
+    body = get_score_review(score_id, get_jwt_identity())
+    if body is None:
         return jsonify({'msg': 'Not found'}), 404
-    
-    answers = []
-    for ua in score.answers: 
-        q = ua.question
-        options = Option.query.filter_by(question_id=q.id).all()
-        answers.append({
-            'question_id': q.id,
-            'question_statement': q.question_statement,
-            'selected_option_id': ua.selected_option_id,
-            'options': [{'id': o.id, 'text': o.text, 'is_correct': o.is_correct} for o in options]
-        })
-    return jsonify({
-        'score_id': score.id,
-        'quiz_id': score.quiz_id,
-        'timestamp': score.timestamp.isoformat() if score.timestamp else "",
-        'total_scored': score.total_scored,
-        'answers': answers
-    })
+    return app.response_class(body, mimetype='application/json')
 
 
 @app.route('/api/user/export_quiz_csv', methods=['POST', 'OPTIONS'])
@@ -643,7 +877,8 @@ def trigger_export_csv():
         return '', 200
 
     user_id = get_jwt_identity()
-    generate_csv_export.delay(user_id)
+    data = request.get_json(silent=True) or {}
+    generate_csv_export.delay(user_id, detail=bool(data.get('detail')), compress=bool(data.get('gzip')))
 
     return jsonify({'msg': 'CSV export started! You will receive an email shortly.'}), 202
 
@@ -662,17 +897,56 @@ def admin_list_users():
         query = query.filter(
             (User.email.ilike(search_pattern)) | (User.full_name.ilike(search_pattern))
         )
-    users = query.order_by(User.id).all()
-    return jsonify([
-        {
+    return list_response(
+        query.order_by(User.id), User,
+        lambda u: {
             'id': u.id,
             'email': u.email,
             'full_name': u.full_name,
             'role': u.role,
             'active': u.active
-        }
-        for u in users
-    ]), 200
+        },
+        sortable={'id': User.id, 'email': User.email},
+        filterable={'role': User.role, 'active': User.active},
+        export=('users', ['id', 'email', 'full_name', 'role', 'active'])
+    )
+
+@app.route('/api/admin/scores', methods=['GET', 'OPTIONS'])
+@jwt_required()
+@admin_required
+def admin_scores():
+    """
+    Paginated listing of every attempt; ?format=ndjson|csv streams them all.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+    return list_response(
+        Score.query, Score,
+        lambda s: {
+            'id': s.id,
+            'user_id': s.user_id,
+            'quiz_id': s.quiz_id,
+            'timestamp': s.timestamp.isoformat() if s.timestamp else "",
+            'total_scored': s.total_scored,
+        },
+        sortable={'id': Score.id, 'timestamp': Score.timestamp},
+        filterable={'user_id': Score.user_id, 'quiz_id': Score.quiz_id},
+        export=('scores', ['id', 'user_id', 'quiz_id', 'timestamp', 'total_scored'])
+    )
+
+@app.route('/api/admin/users/typeahead', methods=['GET', 'OPTIONS'])
+@jwt_required()
+@admin_required
+def admin_user_typeahead():
+    """
+    Top-N users whose email or name tokens start with the query, served
+    from the per-worker prefix index.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', TYPEAHEAD_LIMIT, type=int)
+    return jsonify(typeahead(query, limit)), 200
 
 @app.route('/api/admin/users/<int:user_id>', methods=['PUT', 'DELETE', 'OPTIONS'])
 @jwt_required()
@@ -694,11 +968,17 @@ def admin_edit_delete_user(user_id):
         if 'role' in data:
             user.role = data['role']
         db.session.commit()
+        publish_user_change(user)
         return jsonify({'msg': 'User updated'}), 200
 
     elif request.method == 'DELETE':
+        forget_user(user.id, user.created_at)
+        boards = boards_of_user(user.id)
         db.session.delete(user)
         db.session.commit()
+        forget_user_boards(user_id, boards)
+        publish_user_delete(user_id)
+        drop_history(user_id)
         return jsonify({'msg': 'User deleted'}), 200
 
 
@@ -709,15 +989,10 @@ def admin_edit_delete_user(user_id):
 def admin_user_stats(user_id):
     if request.method == 'OPTIONS':
         return '', 200
-    scores = Score.query.filter_by(user_id=user_id).all()
-    quiz_stats = []
-    for s in scores:
-        quiz = Quiz.query.get(s.quiz_id)
-        quiz_stats.append({
-            'quiz_id': s.quiz_id,
-            'quiz_name': quiz.remarks if quiz and quiz.remarks else f"Quiz #{s.quiz_id}",
-            'score': round(s.total_scored, 2)
-        })
+    quiz_stats = [
+        {'quiz_id': quiz_id, 'quiz_name': name, 'score': round(total_scored, 2)}
+        for _, quiz_id, name, _, total_scored in get_history(user_id)
+    ]
     return jsonify(quiz_stats), 200
 
 
@@ -731,24 +1006,18 @@ def admin_summary_stats():
     if request.method == 'OPTIONS':
         return '', 200
 
-    
-    total_users = User.query.count()
-    reg_chart = [{'date': f'User {i+1}', 'count': 1} for i in range(total_users)]
+    # All three charts read small materialized rollups (see rollups.py), so
+    # this endpoint does the same bounded work however large the site is.
+    registrations = DailyRegistrations.query.order_by(DailyRegistrations.day.desc()).limit(30).all()
+    reg_chart = [{'date': r.day.isoformat(), 'count': r.count} for r in reversed(registrations)]
 
-    
-    quiz_attempts = db.session.query(
-        func.strftime('%Y-%W', Score.timestamp),
-        func.count(Score.id)
-    ).group_by(func.strftime('%Y-%W', Score.timestamp)).order_by(func.min(Score.timestamp)).limit(8).all()
-    quiz_chart = [{'date': (x[0] or "N/A"), 'count': x[1]} for x in quiz_attempts]
+    quiz_attempts = WeeklyAttempts.query.order_by(WeeklyAttempts.week.desc()).limit(8).all()
+    quiz_chart = [{'date': w.week.strftime('%Y-%W'), 'count': w.count} for w in reversed(quiz_attempts)]
 
-    
-    top_scorers = db.session.query(
-        User.full_name, User.email, func.avg(Score.total_scored).label('avg_score')
-    ).join(Score, User.id == Score.user_id)\
-    .group_by(User.id)\
-    .order_by(func.avg(Score.total_scored).desc())\
-    .limit(5).all()
+    top_scorers = db.session.query(User.full_name, User.email, UserScoreAverage.avg_score)\
+        .join(User, User.id == UserScoreAverage.user_id)\
+        .order_by(UserScoreAverage.avg_score.desc())\
+        .limit(5).all()
     top_scorer_chart = [{
         'full_name': t[0],
         'email': t[1],
@@ -760,6 +1029,55 @@ def admin_summary_stats():
         'quizAttempts': quiz_chart,
         'topScorers': top_scorer_chart
     }), 200
+@app.route('/api/admin/monthly_activity', methods=['GET', 'OPTIONS'])
+@jwt_required()
+@admin_required
+def admin_monthly_activity():
+    """
+    Site-wide attempts and average score per month, read from the rollup.
+    """
+    if request.method == 'OPTIONS':
+        return '', 200
+    months = request.args.get('months', 12, type=int)
+    rows = db.session.query(
+        MonthlyActivity.month,
+        func.sum(MonthlyActivity.attempt_count),
+        func.sum(MonthlyActivity.score_sum),
+        func.count(MonthlyActivity.user_id)
+    ).group_by(MonthlyActivity.month).order_by(MonthlyActivity.month.desc()).limit(months).all()
+    return jsonify([
+        {
+            'month': month.strftime('%Y-%m'),
+            'attempts': attempts,
+            'active_users': active_users,
+            'avg_score': round(score_sum / attempts, 2) if attempts else 0
+        }
+        for month, attempts, score_sum, active_users in reversed(rows)
+    ]), 200
+
+
+@app.route('/api/admin/cache_stats', methods=['GET', 'OPTIONS'])
+@jwt_required()
+@admin_required
+def admin_cache_stats():
+    if request.method == 'OPTIONS':
+        return '', 200
+    return jsonify(cache_stats()), 200
+
+
+@app.route('/api/admin/mail_jobs/<run_id>', methods=['GET', 'OPTIONS'])
+@jwt_required()
+@admin_required
+def admin_mail_job_progress(run_id):
+    if request.method == 'OPTIONS':
+        return '', 200
+    from celery_app import mail_job_progress
+    progress = mail_job_progress(run_id)
+    if not progress:
+        return jsonify({'msg': 'Mail job not found'}), 404
+    return jsonify(progress), 200
+
+
 @app.route('/api/admin/search', methods=['GET', 'OPTIONS'])
 @jwt_required()
 @admin_required
@@ -767,35 +1085,48 @@ def admin_global_search():
     if request.method == 'OPTIONS':
         return '', 200
     query = request.args.get('q', '').strip()
-    results = {'users': [], 'subjects': [], 'quizzes': []}
+    results = {'users': [], 'subjects': [], 'quizzes': [], 'chapters': [], 'questions': []}
     if not query:
         return jsonify(results)
+    limit = clamp_limit(request.args.get('limit', SEARCH_LIMIT, type=int))
+
+    if db.engine.dialect.name == 'sqlite':
+        matches = search(query, limit)
+    else:
+        pattern = f'%{query}%'
+        matches = {
+            'users': User.query.filter(
+                (User.email.ilike(pattern)) | (User.full_name.ilike(pattern))
+            ).limit(limit).all(),
+            'subjects': Subject.query.filter(
+                (Subject.name.ilike(pattern)) | (Subject.description.ilike(pattern))
+            ).limit(limit).all(),
+            'chapters': Chapter.query.filter(
+                (Chapter.name.ilike(pattern)) | (Chapter.description.ilike(pattern))
+            ).limit(limit).all(),
+            'quizzes': Quiz.query.filter(Quiz.remarks.ilike(pattern)).limit(limit).all(),
+            'questions': Question.query.filter(Question.question_statement.ilike(pattern)).limit(limit).all(),
+        }
 
-    
-    user_matches = User.query.filter(
-        (User.email.ilike(f'%{query}%')) | (User.full_name.ilike(f'%{query}%'))
-    ).all()
     results['users'] = [
         {'id': u.id, 'email': u.email, 'full_name': u.full_name, 'role': u.role, 'active': u.active}
-        for u in user_matches
+        for u in matches['users']
     ]
-
-   
-    subject_matches = Subject.query.filter(
-        (Subject.name.ilike(f'%{query}%')) | (Subject.description.ilike(f'%{query}%'))
-    ).all()
     results['subjects'] = [
         {'id': s.id, 'name': s.name, 'description': s.description}
-        for s in subject_matches
+        for s in matches['subjects']
+    ]
+    results['chapters'] = [
+        {'id': c.id, 'name': c.name, 'description': c.description, 'subject_id': c.subject_id}
+        for c in matches['chapters']
     ]
-
-    
-    quiz_matches = Quiz.query.filter(
-        Quiz.remarks.ilike(f'%{query}%')
-    ).all()
     results['quizzes'] = [
         {'id': q.id, 'remarks': q.remarks, 'chapter_id': q.chapter_id, 'date_of_quiz': q.date_of_quiz.isoformat() if q.date_of_quiz else ""}
-        for q in quiz_matches
+        for q in matches['quizzes']
+    ]
+    results['questions'] = [
+        {'id': q.id, 'quiz_id': q.quiz_id, 'question_statement': q.question_statement}
+        for q in matches['questions']
     ]
 
     return jsonify(results)
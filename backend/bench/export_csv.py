@@ -0,0 +1,153 @@
+"""
+CSV export time for a heavy user, before and after the streaming export
+in celery_app.write_csv_export.
+
+Seeds one user with --attempts scores (ten answers each) in a throwaway
+SQLite database, then writes the export the old way and the new way.
+
+    python bench/export_csv.py --attempts 50000
+
+"before" reimplements the original task: Score.query.all() into memory,
+then Quiz.query.get() per score for its date and a DictWriter row per
+score. "after" runs write_csv_export plain, with detail=True and with
+compress=True.
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+# The app reads DATABASE_URL at import time.
+WORKDIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORKDIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, insert  # noqa: E402
+
+from app import app, setup_db  # noqa: E402
+from celery_app import write_csv_export  # noqa: E402
+from models import db, User, Subject, Chapter, Quiz, Question, Option, Score, UserAnswer  # noqa: E402
+
+
+QUIZZES = 200
+QUESTIONS_PER_QUIZ = 10
+OPTIONS_PER_QUESTION = 4
+INSERT_CHUNK = 10000
+
+
+def bulk(table, rows):
+    for start in range(0, len(rows), INSERT_CHUNK):
+        db.session.execute(insert(table), rows[start:start + INSERT_CHUNK])
+
+
+def seed(attempts):
+    db.session.execute(insert(User), [{
+        'id': 2, 'email': 'heavy@example.com', 'password': 'x', 'full_name': 'Heavy User',
+        'qualification': 'NA', 'role': 'user'
+    }])
+    db.session.execute(insert(Subject), [{'id': 1, 'name': 'Physics'}])
+    db.session.execute(insert(Chapter), [{'id': 1, 'subject_id': 1, 'name': 'Motion'}])
+    start = datetime(2025, 1, 1)
+    bulk(Quiz, [
+        {'id': q, 'chapter_id': 1, 'date_of_quiz': start + timedelta(days=q), 'time_duration': 30, 'remarks': ''}
+        for q in range(1, QUIZZES + 1)
+    ])
+    bulk(Question, [
+        {'id': n, 'quiz_id': (n - 1) // QUESTIONS_PER_QUIZ + 1, 'question_statement': f'Question {n}'}
+        for n in range(1, QUIZZES * QUESTIONS_PER_QUIZ + 1)
+    ])
+    bulk(Option, [
+        {'id': n, 'question_id': (n - 1) // OPTIONS_PER_QUESTION + 1, 'text': f'Option {n}',
+         'is_correct': n % OPTIONS_PER_QUESTION == 1}
+        for n in range(1, QUIZZES * QUESTIONS_PER_QUIZ * OPTIONS_PER_QUESTION + 1)
+    ])
+    bulk(Score, [
+        {'id': s, 'user_id': 2, 'quiz_id': s % QUIZZES + 1, 'total_scored': 50.0,
+         'timestamp': start + timedelta(minutes=s)}
+        for s in range(1, attempts + 1)
+    ])
+    answers = []
+    for s in range(1, attempts + 1):
+        first_question = (s % QUIZZES) * QUESTIONS_PER_QUIZ + 1
+        for question_id in range(first_question, first_question + QUESTIONS_PER_QUIZ):
+            answers.append({
+                'score_id': s, 'question_id': question_id,
+                'selected_option_id': (question_id - 1) * OPTIONS_PER_QUESTION + 1 + s % 2
+            })
+        if len(answers) >= INSERT_CHUNK:
+            bulk(UserAnswer, answers)
+            answers = []
+    bulk(UserAnswer, answers)
+    db.session.commit()
+
+
+def legacy_export(user_id, filepath):
+    scores = Score.query.filter_by(user_id=user_id).all()
+    with open(filepath, 'w', newline='') as csvfile:
+        fieldnames = ['score_id', 'quiz_id', 'quiz_date', 'total_scored', 'timestamp']
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        for score in scores:
+            quiz = Quiz.query.get(score.quiz_id)
+            writer.writerow({
+                'score_id': score.id,
+                'quiz_id': score.quiz_id,
+                'quiz_date': quiz.date_of_quiz.isoformat() if quiz else '',
+                'total_scored': score.total_scored,
+                'timestamp': score.timestamp.isoformat()
+            })
+    return len(scores)
+
+
+@contextmanager
+def count_statements():
+    counter = {'n': 0}
+
+    def count(*args):
+        counter['n'] += 1
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        yield counter
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+
+
+def run(label, export, filepath):
+    # Start each run with an empty identity map, as a fresh worker would.
+    db.session.expire_all()
+    db.session.expunge_all()
+    with count_statements() as statements:
+        started = time.perf_counter()
+        rows = export(filepath)
+        elapsed = time.perf_counter() - started
+    db.session.rollback()
+    size = os.path.getsize(filepath) / 1024 / 1024
+    print(f'{label:>14}: {elapsed:7.2f}s  {rows:8d} rows  {size:7.1f} MiB  {statements["n"]:6d} queries')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--attempts', type=int, default=50000)
+    args = parser.parse_args()
+
+    setup_db()
+    with app.app_context():
+        started = time.perf_counter()
+        seed(args.attempts)
+        print(f'seeded {args.attempts} attempts in {time.perf_counter() - started:.1f}s')
+
+        run('before', lambda path: legacy_export(2, path), os.path.join(WORKDIR, 'before.csv'))
+        run('after', lambda path: write_csv_export(2, path), os.path.join(WORKDIR, 'after.csv'))
+        run('after detail', lambda path: write_csv_export(2, path, detail=True),
+            os.path.join(WORKDIR, 'detail.csv'))
+        run('after gzip', lambda path: write_csv_export(2, path, detail=True, compress=True),
+            os.path.join(WORKDIR, 'detail.csv.gz'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Email rendering throughput in messages per second, before and after the
+cached templates in emails.py.
+
+    python bench/render_mail.py --messages 20000
+    python bench/render_mail.py --messages 2000 --send localhost:1025
+
+"before" compiles the subject, text and HTML templates for every
+message, which is what rendering per user costs without the cache;
+"after" is emails.render_messages. Both build the same multipart
+messages. With --send the rendered batch is also pushed through an
+SMTPPool (domain rate limiting off) to measure end-to-end delivery.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from emails import APP_URL, EMAIL_TEMPLATES, _env, render_messages  # noqa: E402
+from mail import DomainRateLimiter, SMTPPool, build_message  # noqa: E402
+
+
+SEND_BATCH_SIZE = 500
+
+
+def rows_for(name, count):
+    if name == 'reminder':
+        return [{'email': f'user{i}@example{i % 50}.com', 'full_name': f'User {i}'} for i in range(count)]
+    return [
+        {'email': f'user{i}@example{i % 50}.com', 'full_name': f'User {i}',
+         'quiz_count': i % 12, 'avg_score': (i % 100) * 1.0}
+        for i in range(count)
+    ]
+
+
+def render_uncached(name, rows, **shared):
+    loader = _env.loader
+    shared.setdefault('app_url', APP_URL)
+    messages = []
+    for row in rows:
+        subject_template = _env.from_string(EMAIL_TEMPLATES[name]['subject'])
+        text_template = _env.from_string(loader.get_source(_env, f'{name}.txt')[0])
+        html_template = _env.from_string(loader.get_source(_env, f'{name}.html')[0])
+        context = dict(shared, **row)
+        messages.append(build_message(
+            row['email'],
+            subject_template.render(context),
+            text_template.render(context),
+            html=html_template.render(context)
+        ))
+    return messages
+
+
+def timed(render, name, rows, shared):
+    started = time.perf_counter()
+    messages = render(name, rows, **shared)
+    return messages, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--send', metavar='HOST:PORT', help='also deliver the rendered messages')
+    args = parser.parse_args()
+
+    for name, shared in (('reminder', {}), ('monthly_report', {'month': 'January 2025'})):
+        rows = rows_for(name, args.messages)
+        render_messages(name, rows[:1], **shared)  # compile outside the timing
+        _, before = timed(render_uncached, name, rows, shared)
+        messages, after = timed(render_messages, name, rows, shared)
+        print(f'{name:>14}: before {len(rows) / before:9.0f} msg/s  '
+              f'after {len(rows) / after:9.0f} msg/s  ({before / after:.1f}x)')
+
+        if args.send:
+            host, port = args.send.rsplit(':', 1)
+            pool = SMTPPool(host, int(port), rate_limiter=DomainRateLimiter(rate=0))
+            started = time.perf_counter()
+            sent = sum(pool.send_batch(messages[i:i + SEND_BATCH_SIZE])
+                       for i in range(0, len(messages), SEND_BATCH_SIZE))
+            elapsed = time.perf_counter() - started
+            pool.close()
+            print(f'{"":>14}  sent {sent} in {elapsed:.2f}s ({sent / elapsed:.0f} msg/s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""
+Admin search latency over a large catalogue, before and after the FTS5
+index in search.py.
+
+Fills a throwaway SQLite database with --rows rows spread over users,
+subjects, chapters, quizzes and questions, builds the search index with
+the migrations, then times a handful of queries.
+
+    python bench/search_latency.py --rows 1000000
+
+"before" is the original approach, ILIKE '%q%' on the same columns, here
+applied to all five tables and capped at the same limit so both sides
+return comparable results; "after" is search.search().
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# The app reads DATABASE_URL at import time.
+WORKDIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(WORKDIR, 'bench.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, or_  # noqa: E402
+
+from app import app  # noqa: E402
+from migrations import run_migrations  # noqa: E402
+from models import db, User, Subject, Chapter, Quiz, Question  # noqa: E402
+from search import SEARCH_LIMIT, search  # noqa: E402
+
+
+# Share of --rows given to each table; questions take the rest.
+SHARES = {'users': 0.2, 'subjects': 0.001, 'chapters': 0.02, 'quizzes': 0.2}
+VOCABULARY = 5000
+INSERT_CHUNK = 20000
+QUERIES = ['velocity', 'vel', 'newton law', 'word42', 'thermodynamics entropy', 'nomatchatall']
+REPEAT = 20
+
+
+def words(rng, n):
+    return ' '.join(f'word{rng.randrange(VOCABULARY)}' for _ in range(n))
+
+
+def sentence(rng, n):
+    # Mix a few real terms into the generated vocabulary so the timed
+    # queries hit both common and rare tokens.
+    extra = rng.choice(['velocity', 'newton law of motion', 'entropy', 'thermodynamics', '', '', '', ''])
+    return f'{words(rng, n)} {extra}'.strip()
+
+
+def bulk(model, rows):
+    rows = iter(rows)
+    while True:
+        chunk = [row for _, row in zip(range(INSERT_CHUNK), rows)]
+        if not chunk:
+            break
+        db.session.execute(insert(model), chunk)
+
+
+def seed(total):
+    rng = random.Random(1)
+    counts = {name: max(1, int(total * share)) for name, share in SHARES.items()}
+    counts['questions'] = max(1, total - sum(counts.values()))
+
+    bulk(User, ({
+        'email': f'user{i}@example.com', 'password': 'x', 'full_name': f'{words(rng, 2)} {i}',
+        'qualification': 'NA', 'role': 'user'
+    } for i in range(counts['users'])))
+    bulk(Subject, ({'name': sentence(rng, 2), 'description': sentence(rng, 8)} for _ in range(counts['subjects'])))
+    bulk(Chapter, ({
+        'subject_id': rng.randrange(counts['subjects']) + 1, 'name': sentence(rng, 3),
+        'description': sentence(rng, 10)
+    } for _ in range(counts['chapters'])))
+    bulk(Quiz, ({
+        'chapter_id': rng.randrange(counts['chapters']) + 1, 'date_of_quiz': datetime(2025, 1, 1),
+        'time_duration': 30, 'remarks': sentence(rng, 6)
+    } for _ in range(counts['quizzes'])))
+    bulk(Question, ({
+        'quiz_id': rng.randrange(counts['quizzes']) + 1, 'question_statement': sentence(rng, 15)
+    } for _ in range(counts['questions'])))
+    db.session.commit()
+    return counts
+
+
+def ilike_search(query, limit=SEARCH_LIMIT):
+    pattern = f'%{query}%'
+    columns = {
+        User: [User.email, User.full_name],
+        Subject: [Subject.name, Subject.description],
+        Chapter: [Chapter.name, Chapter.description],
+        Quiz: [Quiz.remarks],
+        Question: [Question.question_statement],
+    }
+    results = []
+    for model, cols in columns.items():
+        remaining = limit - len(results)
+        if remaining <= 0:
+            break
+        results += model.query.filter(or_(*(c.ilike(pattern) for c in cols))).limit(remaining).all()
+    return results
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+def timings(fn, query):
+    samples = []
+    for _ in range(REPEAT):
+        started = time.perf_counter()
+        fn(query)
+        samples.append((time.perf_counter() - started) * 1000)
+        db.session.expunge_all()
+    return percentile(samples, 0.5), percentile(samples, 0.95)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        counts = seed(args.rows)
+        # Building the index after the bulk load is one INSERT ... SELECT
+        # per table instead of a trigger call per row.
+        run_migrations()
+        print(f"seeded {sum(counts.values())} rows and indexed them in {time.perf_counter() - started:.1f}s "
+              f"({', '.join(f'{n} {name}' for name, n in counts.items())})")
+
+        print(f"{'query':>24}  {'before p50':>10}  {'p95':>8}  {'after p50':>10}  {'p95':>8}")
+        for query in QUERIES:
+            before = timings(ilike_search, query)
+            after = timings(search, query)
+            print(f'{query:>24}  {before[0]:8.1f}ms  {before[1]:6.1f}ms  {after[0]:8.1f}ms  {after[1]:6.1f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Concurrent quiz-submit throughput on SQLite, before and after the
+connection settings in config.py.
+
+Writer threads commit submit-shaped transactions (one Score row plus its
+UserAnswer rows) while reader threads keep listing a user's scores, the
+way students refresh their score page during an exam.
+
+    python bench/submit_throughput.py --writers 8 --readers 8 --submits 250
+
+"before" uses a plain engine with SQLite's defaults, as the app did when
+it hard-coded sqlite:///database.db; "after" uses engine_options() and
+the per-connection PRAGMAs.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, event, insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import apply_sqlite_pragmas, engine_options  # noqa: E402
+from models import db, Score, UserAnswer  # noqa: E402
+
+
+ANSWERS_PER_SUBMIT = 10
+
+
+def make_engine(mode, url):
+    # config.py registers its PRAGMA listener on every Engine; take it off
+    # for the baseline run.
+    if event.contains(Engine, 'connect', apply_sqlite_pragmas):
+        event.remove(Engine, 'connect', apply_sqlite_pragmas)
+    if mode == 'before':
+        return create_engine(url)
+    event.listen(Engine, 'connect', apply_sqlite_pragmas)
+    return create_engine(url, **engine_options(url))
+
+
+def submit(engine, user_id, quiz_id):
+    with engine.begin() as conn:
+        score_id = conn.execute(insert(Score.__table__).values(
+            quiz_id=quiz_id, user_id=user_id, timestamp=datetime.utcnow(), total_scored=50.0
+        )).inserted_primary_key[0]
+        conn.execute(insert(UserAnswer.__table__), [
+            {'score_id': score_id, 'question_id': q, 'selected_option_id': q * 4}
+            for q in range(1, ANSWERS_PER_SUBMIT + 1)
+        ])
+
+
+def read_scores(engine, user_id):
+    with engine.connect() as conn:
+        conn.execute(select(Score.__table__).where(Score.__table__.c.user_id == user_id)).all()
+
+
+def run(mode, writers, readers, submits):
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    url = f'sqlite:///{path}'
+    engine = make_engine(mode, url)
+    db.metadata.create_all(engine)
+
+    counts = {'submits': 0, 'reads': 0, 'errors': 0}
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def writer(n):
+        for i in range(submits):
+            try:
+                submit(engine, user_id=n, quiz_id=i % 20 + 1)
+                key = 'submits'
+            except OperationalError:
+                key = 'errors'
+            with lock:
+                counts[key] += 1
+
+    def reader(n):
+        while not done.is_set():
+            try:
+                read_scores(engine, user_id=n % max(writers, 1))
+                key = 'reads'
+            except OperationalError:
+                key = 'errors'
+            with lock:
+                counts[key] += 1
+
+    write_threads = [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    read_threads = [threading.Thread(target=reader, args=(n,)) for n in range(readers)]
+    started = time.perf_counter()
+    for t in write_threads + read_threads:
+        t.start()
+    for t in write_threads:
+        t.join()
+    done.set()
+    for t in read_threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+
+    print(f"{mode:>6}: {counts['submits'] / elapsed:8.1f} submits/s  "
+          f"{counts['reads'] / elapsed:8.1f} reads/s  "
+          f"{counts['errors']:5d} errors  ({elapsed:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--submits', type=int, default=250, help='submits per writer')
+    args = parser.parse_args()
+    for mode in ('before', 'after'):
+        run(mode, args.writers, args.readers, args.submits)
+
+
+if __name__ == '__main__':
+    main()
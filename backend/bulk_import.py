@@ -0,0 +1,289 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from sqlalchemy import insert
+
+from models import db, Chapter, Quiz, Question, Option
+
+
+MAX_IMPORT_QUESTIONS = 10000
+OPTION_TEXT_LENGTH = 255
+
+# One CSV row per option. Rows sharing a quiz (quiz_ref, or quiz_id for an
+# existing quiz) and a question statement are grouped together; the quiz
+# columns are read from the first row of each quiz.
+CSV_FIELDS = [
+    'quiz_ref', 'quiz_id', 'chapter_id', 'date_of_quiz', 'time_duration', 'remarks',
+    'question', 'option', 'is_correct'
+]
+TRUE_VALUES = {'1', 'true', 't', 'yes', 'y'}
+FALSE_VALUES = {'', '0', 'false', 'f', 'no', 'n'}
+
+
+class BulkImportError(Exception):
+    def __init__(self, errors):
+        super().__init__(f'{len(errors)} invalid rows')
+        self.errors = errors
+
+
+def parse_quiz_date(value):
+    """
+    Accept the same date formats as the quiz form: YYYY-MM-DD or an ISO
+    datetime with or without seconds.
+    """
+    if len(value) == 10:
+        return datetime.strptime(value, "%Y-%m-%d")
+    if len(value) == 16:
+        value += ":00"
+    return datetime.fromisoformat(value)
+
+
+def _int(value):
+    """
+    An integer from JSON (an int) or CSV (a string of digits). Floats and
+    booleans are rejected instead of being truncated.
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise TypeError(f'{value!r} is not an integer')
+    return int(value)
+
+
+def quizzes_from_json(data):
+    """
+    A payload is one quiz object, a list of quizzes or {"quizzes": [...]}.
+    Structural problems (wrong types, non-boolean is_correct) are collected
+    and reported together.
+    """
+    if isinstance(data, dict):
+        data = data['quizzes'] if 'quizzes' in data else [data]
+    if not isinstance(data, list):
+        raise BulkImportError([{'row': '', 'msg': 'Expected a quiz or a list of quizzes'}])
+
+    errors = []
+
+    def items(value, where, name):
+        if value is None:
+            return []
+        if not isinstance(value, list):
+            errors.append({'row': where, 'msg': f'{name} must be a list'})
+            return []
+        return value
+
+    quizzes = []
+    for i, q in enumerate(data):
+        where = f'quizzes[{i}]'
+        if not isinstance(q, dict):
+            errors.append({'row': where, 'msg': 'Expected an object'})
+            continue
+        questions = []
+        for j, question in enumerate(items(q.get('questions'), where, 'questions')):
+            question_where = f'{where}.questions[{j}]'
+            if not isinstance(question, dict):
+                errors.append({'row': question_where, 'msg': 'Expected an object'})
+                continue
+            options = []
+            for k, o in enumerate(items(question.get('options'), question_where, 'options')):
+                option_where = f'{question_where}.options[{k}]'
+                if not isinstance(o, dict):
+                    errors.append({'row': option_where, 'msg': 'Expected an object'})
+                    continue
+                is_correct = o.get('is_correct', False)
+                if not isinstance(is_correct, bool):
+                    errors.append({'row': option_where, 'msg': 'is_correct must be true or false'})
+                options.append({'row': option_where, 'text': o.get('text'), 'is_correct': is_correct is True})
+            questions.append({
+                'row': question_where,
+                'question_statement': question.get('question_statement'),
+                'options': options
+            })
+        quizzes.append({
+            'row': where,
+            'quiz_id': q.get('quiz_id'),
+            'chapter_id': q.get('chapter_id'),
+            'date_of_quiz': q.get('date_of_quiz'),
+            'time_duration': q.get('time_duration'),
+            'remarks': q.get('remarks', ''),
+            'questions': questions
+        })
+    if errors:
+        raise BulkImportError(errors)
+    return quizzes
+
+
+def quizzes_from_csv(text):
+    reader = csv.DictReader(io.StringIO(text))
+    missing = {'question', 'option'} - set(reader.fieldnames or [])
+    if missing:
+        raise BulkImportError([{'row': 1, 'msg': f"Missing columns: {', '.join(sorted(missing))}"}])
+
+    quizzes = {}
+    errors = []
+    for line, row in enumerate(reader, start=2):
+        ref = (row.get('quiz_ref') or '').strip() or f"id:{(row.get('quiz_id') or '').strip()}"
+        quiz = quizzes.get(ref)
+        if quiz is None:
+            quiz = quizzes[ref] = {
+                'row': line,
+                'quiz_id': (row.get('quiz_id') or '').strip() or None,
+                'chapter_id': (row.get('chapter_id') or '').strip() or None,
+                'date_of_quiz': (row.get('date_of_quiz') or '').strip() or None,
+                'time_duration': (row.get('time_duration') or '').strip() or None,
+                'remarks': row.get('remarks') or '',
+                'questions': [],
+                '_questions': {}
+            }
+        statement = row.get('question') or ''
+        question = quiz['_questions'].get(statement)
+        if question is None:
+            question = quiz['_questions'][statement] = {
+                'row': line, 'question_statement': statement, 'options': []
+            }
+            quiz['questions'].append(question)
+        is_correct = (row.get('is_correct') or '').strip().lower()
+        if is_correct not in TRUE_VALUES | FALSE_VALUES:
+            errors.append({'row': line, 'msg': 'is_correct must be true or false'})
+        question['options'].append({
+            'row': line,
+            'text': row.get('option'),
+            'is_correct': is_correct in TRUE_VALUES
+        })
+    if errors:
+        raise BulkImportError(errors)
+    for quiz in quizzes.values():
+        del quiz['_questions']
+    return list(quizzes.values())
+
+
+def parse_upload(request):
+    """
+    Read quizzes from an uploaded .json/.csv file or from a JSON body.
+    """
+    upload = request.files.get('file')
+    if upload is None:
+        data = request.get_json(silent=True)
+        if data is None:
+            raise BulkImportError([{'row': '', 'msg': 'Send a JSON body or a .json/.csv file'}])
+        return quizzes_from_json(data)
+
+    try:
+        text = upload.read().decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise BulkImportError([{'row': '', 'msg': 'File must be UTF-8'}])
+    if (upload.filename or '').lower().endswith('.csv'):
+        return quizzes_from_csv(text)
+    try:
+        return quizzes_from_json(json.loads(text))
+    except ValueError as e:
+        raise BulkImportError([{'row': '', 'msg': f'Invalid JSON: {e}'}])
+
+
+def validate(quizzes):
+    """
+    Check every quiz, question and option before anything is written,
+    collecting all errors. Chapter and existing-quiz ids are checked with
+    one query each.
+    """
+    errors = []
+
+    def fail(row, msg):
+        errors.append({'row': row, 'msg': msg})
+
+    chapter_ids, quiz_ids = set(), set()
+    for quiz in quizzes:
+        try:
+            quiz['quiz_id'] = _int(quiz['quiz_id'])
+            quiz['chapter_id'] = _int(quiz['chapter_id'])
+        except (TypeError, ValueError):
+            fail(quiz['row'], 'quiz_id and chapter_id must be integers')
+            continue
+        if quiz['quiz_id'] is not None:
+            quiz_ids.add(quiz['quiz_id'])
+            continue
+        if quiz['chapter_id'] is None:
+            fail(quiz['row'], 'quiz_id or chapter_id required')
+        else:
+            chapter_ids.add(quiz['chapter_id'])
+        try:
+            quiz['date_of_quiz'] = parse_quiz_date(quiz['date_of_quiz'])
+        except Exception as e:
+            fail(quiz['row'], f'Invalid date format: {e}')
+        try:
+            quiz['time_duration'] = _int(quiz['time_duration'])
+        except (TypeError, ValueError):
+            quiz['time_duration'] = None
+        if not quiz['time_duration'] or quiz['time_duration'] <= 0:
+            fail(quiz['row'], 'time_duration must be a positive integer')
+        if quiz['remarks'] is None:
+            quiz['remarks'] = ''
+        elif not isinstance(quiz['remarks'], str):
+            fail(quiz['row'], 'remarks must be a string')
+
+    known_chapters = {c for (c,) in db.session.query(Chapter.id).filter(Chapter.id.in_(chapter_ids))} if chapter_ids else set()
+    known_quizzes = {q for (q,) in db.session.query(Quiz.id).filter(Quiz.id.in_(quiz_ids))} if quiz_ids else set()
+
+    total_questions = 0
+    for quiz in quizzes:
+        if quiz['quiz_id'] is not None and quiz['quiz_id'] not in known_quizzes:
+            fail(quiz['row'], f"Quiz {quiz['quiz_id']} not found")
+        elif quiz['quiz_id'] is None and quiz['chapter_id'] is not None \
+                and quiz['chapter_id'] not in known_chapters:
+            fail(quiz['row'], f"Chapter {quiz['chapter_id']} not found")
+        if not quiz['questions']:
+            fail(quiz['row'], 'At least one question required')
+
+        for question in quiz['questions']:
+            total_questions += 1
+            statement = question['question_statement']
+            if not isinstance(statement, str) or not statement.strip():
+                fail(question['row'], 'question_statement required')
+            if len(question['options']) < 2:
+                fail(question['row'], 'At least two options required')
+            elif not any(o['is_correct'] for o in question['options']):
+                fail(question['row'], 'At least one option must be correct')
+            for option in question['options']:
+                text = option['text']
+                if not isinstance(text, str) or not text.strip():
+                    fail(option['row'], 'Option text required')
+                elif len(text) > OPTION_TEXT_LENGTH:
+                    fail(option['row'], f'Option text longer than {OPTION_TEXT_LENGTH} characters')
+
+    if total_questions > MAX_IMPORT_QUESTIONS:
+        fail('', f'At most {MAX_IMPORT_QUESTIONS} questions per import')
+    if errors:
+        raise BulkImportError(errors)
+
+
+def import_quizzes(quizzes):
+    """
+    Insert validated quizzes, questions and options with three bulk
+    INSERT ... RETURNING statements in the caller's transaction. Returns
+    the quiz id each entry was written to.
+    """
+    new_quizzes = [q for q in quizzes if q['quiz_id'] is None]
+    if new_quizzes:
+        ids = db.session.scalars(
+            insert(Quiz).returning(Quiz.id, sort_by_parameter_order=True),
+            [{'chapter_id': q['chapter_id'], 'date_of_quiz': q['date_of_quiz'],
+              'time_duration': q['time_duration'], 'remarks': q['remarks']}
+             for q in new_quizzes]
+        ).all()
+        for quiz, quiz_id in zip(new_quizzes, ids):
+            quiz['quiz_id'] = quiz_id
+
+    questions = [(quiz, question) for quiz in quizzes for question in quiz['questions']]
+    question_ids = db.session.scalars(
+        insert(Question).returning(Question.id, sort_by_parameter_order=True),
+        [{'quiz_id': quiz['quiz_id'], 'question_statement': question['question_statement']}
+         for quiz, question in questions]
+    ).all()
+
+    db.session.execute(insert(Option), [
+        {'question_id': question_id, 'text': option['text'], 'is_correct': option['is_correct']}
+        for (_, question), question_id in zip(questions, question_ids)
+        for option in question['options']
+    ])
+    return [quiz['quiz_id'] for quiz in quizzes]
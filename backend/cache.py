@@ -1,7 +1,39 @@
+import time
 
+import redis
 from flask_caching import Cache
 
+REDIS_URL = 'redis://127.0.0.1:6379/0'
+
 cache = Cache(config={
     'CACHE_TYPE': 'redis',
-    'CACHE_REDIS_URL': 'redis://127.0.0.1:6379/0'  
+    'CACHE_REDIS_URL': REDIS_URL
 })
+
+# Raw client on the same redis as `cache`, for lists/sets that the
+# Flask-Caching key/value API cannot express.
+redis_client = redis.Redis.from_url(REDIS_URL)
+
+
+def version_key(name):
+    return f'version:{name}'
+
+
+def get_version(name):
+    """
+    Return the current version token for a cached resource, creating one if
+    it is missing (e.g. after a Redis flush) so stale entries never match.
+    """
+    key = version_key(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=0)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(name):
+    """
+    Invalidate everything tagged with `name` by giving it a new version.
+    """
+    cache.set(version_key(name), time.time_ns(), timeout=0)
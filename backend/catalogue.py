@@ -0,0 +1,179 @@
+import time
+from datetime import datetime, timezone
+
+from urllib.parse import urlencode
+
+from flask import current_app, request
+
+from cache import cache, redis_client, version_key, get_version, bump_version
+from models import Chapter, Quiz
+from papers import invalidate_quiz
+
+
+CACHE_TIMEOUT = 60 * 60
+CACHE_STATS_KEY = 'catalogue:stats'
+
+# List-level tags cover the admin listings of every row of a kind. The
+# per-parent tags below cover one subject's chapters, one chapter's
+# quizzes and one quiz's questions.
+SUBJECTS_TAG = 'subjects'
+CHAPTERS_TAG = 'chapters'
+QUIZZES_TAG = 'quizzes'
+QUESTIONS_TAG = 'questions'
+OPTIONS_TAG = 'options'
+
+
+def subject_tag(subject_id):
+    return f'subject:{subject_id}'
+
+
+def chapter_tag(chapter_id):
+    return f'chapter:{chapter_id}'
+
+
+def dependents_of_subject(subject_id):
+    """
+    Chapter and quiz ids under a subject, read before a cascading delete.
+    """
+    chapter_ids = [c for (c,) in Chapter.query.with_entities(Chapter.id).filter_by(subject_id=subject_id)]
+    return chapter_ids, dependents_of_chapters(*chapter_ids)
+
+
+def dependents_of_chapters(*chapter_ids):
+    if not chapter_ids:
+        return []
+    return [q for (q,) in Quiz.query.with_entities(Quiz.id).filter(Quiz.chapter_id.in_(chapter_ids))]
+
+
+def _bump(*tags):
+    for tag in set(tags):
+        bump_version(tag)
+
+
+def subjects_changed(*subject_ids, chapter_ids=(), quiz_ids=()):
+    """
+    A subject was created, renamed or deleted. Chapter rows embed the
+    subject name; for deletes pass the cascaded chapter and quiz ids.
+    """
+    _bump(SUBJECTS_TAG, CHAPTERS_TAG, *[subject_tag(i) for i in subject_ids if i is not None])
+    if chapter_ids:
+        chapters_changed(*chapter_ids, quiz_ids=quiz_ids)
+
+
+def chapters_changed(*chapter_ids, subject_ids=(), quiz_ids=()):
+    """
+    A chapter was created, edited, moved or deleted. Quiz rows embed the
+    chapter name; for deletes pass the cascaded quiz ids.
+    """
+    _bump(CHAPTERS_TAG, QUIZZES_TAG,
+          *[subject_tag(i) for i in subject_ids if i is not None],
+          *[chapter_tag(i) for i in chapter_ids if i is not None])
+    if quiz_ids:
+        quizzes_changed(*quiz_ids)
+
+
+def quizzes_changed(*quiz_ids, chapter_ids=()):
+    """
+    A quiz was created, edited, moved or deleted. Question rows embed the
+    quiz remarks, and deletes cascade to questions, options and scores.
+    """
+    _bump(QUIZZES_TAG, QUESTIONS_TAG, OPTIONS_TAG,
+          *[chapter_tag(i) for i in chapter_ids if i is not None])
+    invalidate_quiz(*quiz_ids)
+
+
+def questions_changed(*quiz_ids):
+    """
+    A question of the given quizzes was created, edited, moved or deleted.
+    """
+    _bump(QUESTIONS_TAG, OPTIONS_TAG)
+    invalidate_quiz(*quiz_ids)
+
+
+def options_changed(*quiz_ids):
+    _bump(OPTIONS_TAG)
+    invalidate_quiz(*quiz_ids)
+
+
+def _count(namespace, outcome):
+    redis_client.hincrby(CACHE_STATS_KEY, f'{namespace}:{outcome}', 1)
+
+
+def cache_stats():
+    """
+    Hit and miss counts per cached endpoint, across all workers.
+    """
+    stats = {}
+    for field, value in redis_client.hgetall(CACHE_STATS_KEY).items():
+        namespace, outcome = field.decode().rsplit(':', 1)
+        stats.setdefault(namespace, {'hit': 0, 'miss': 0})[outcome] = int(value)
+    return stats
+
+
+def cached_response(namespace, tags, build):
+    """
+    Serve a JSON response from the cache while every tag in `tags` is at
+    the version it was stored under; otherwise build and store it. The key
+    includes the query string, so each page or filter is its own entry.
+    """
+    if request.args.get('format'):
+        # Streamed exports are never cached.
+        return build()
+
+    args = urlencode(sorted(request.args.items(multi=True)))
+    key = f'catalogue:{namespace}:{args}'
+    *versions, entry = cache.get_many(*[version_key(tag) for tag in tags], key)
+
+    if entry is not None and None not in versions and entry['versions'] == versions:
+        _count(namespace, 'hit')
+        return current_app.response_class(
+            entry['body'], status=entry['status'], headers=entry['headers'], mimetype='application/json'
+        )
+
+    _count(namespace, 'miss')
+    # Versions are read before building so a write that lands mid-build
+    # leaves this entry stale rather than masking the newer data.
+    versions = [get_version(tag) for tag in tags]
+    response = build()
+    if isinstance(response, tuple):
+        response = current_app.make_response(response)
+    if response.status_code == 200 and not response.is_streamed:
+        cache.set(key, {
+            'versions': versions,
+            'status': response.status_code,
+            'headers': [(k, v) for k, v in response.headers.items() if k.startswith('X-')],
+            'body': response.get_data(),
+        }, timeout=CACHE_TIMEOUT)
+    return response
+
+
+def conditional(tag, build):
+    """
+    Serve `build()` with a strong ETag and Last-Modified derived from the
+    version of `tag`. A matching If-None-Match (or a fresh
+    If-Modified-Since) gets a 304 before any query or serialization.
+    """
+    version = get_version(tag)
+    etag = f'{tag}-{version}'
+    last_modified = datetime.fromtimestamp(version // 1_000_000_000, tz=timezone.utc)
+
+    not_modified = False
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    elif request.if_modified_since:
+        not_modified = request.if_modified_since >= last_modified
+
+    if not_modified:
+        response = current_app.response_class(status=304)
+    else:
+        response = build()
+    response.set_etag(etag)
+    # Last-Modified has one-second resolution, so a second change within
+    # the same second would be invisible to If-Modified-Since. Only send it
+    # once that second is over; until then clients revalidate by ETag.
+    if time.time_ns() // 1_000_000_000 > version // 1_000_000_000:
+        response.last_modified = last_modified
+    # Clients may keep a copy but must revalidate; content is per-login.
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
@@ -1,13 +1,28 @@
-from celery import Celery
+from celery import Celery, chord
 from celery.schedules import crontab
 from datetime import datetime, timedelta
 
 from app import app 
-from models import db, User, Score, Quiz  
-from mail import send_mail  
+from models import db, User, Score, Quiz, UserAnswer, Option, MonthlyActivity
+from rollups import record_attempts, rebuild_rollups
+from submissions import (
+    take_batch, ack_batch, restore_batch, recover_processing, ingest_lock, mark_stored, pending_count,
+    batch_failed, batch_stored, dead_letter, MAX_BATCH_FAILURES
+)
+from cache import redis_client
+from history import append_scores
+from leaderboard import record_scores, rebuild_leaderboards
+from mail import send_messages
+from emails import render_messages
 
 import csv
+import gzip
+import logging
 import os
+import uuid
+
+from redis.exceptions import LockError
+from sqlalchemy import insert, func, or_
 
 
 celery = Celery(
@@ -22,123 +37,429 @@ celery.conf.update(
 )
 
 
+EXPORT_BATCH_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def write_csv_export(user_id, filepath, detail=False, compress=False):
+    """
+    Write a user's attempts to `filepath` as CSV (gzip-compressed when
+    `compress`) and return the number of data rows.
+
+    The rows come from one joined query streamed with yield_per and are
+    written in buffered batches. With detail=True each attempt expands to
+    one row per answered question.
+    """
+    fieldnames = ['score_id', 'quiz_id', 'quiz_date', 'total_scored', 'timestamp']
+    columns = [Score.id, Score.quiz_id, Quiz.date_of_quiz, Score.total_scored, Score.timestamp]
+    query = db.session.query(*columns).outerjoin(Quiz, Quiz.id == Score.quiz_id)
+    if detail:
+        fieldnames += ['question_id', 'selected_option_id', 'is_correct']
+        query = query.add_columns(UserAnswer.question_id, UserAnswer.selected_option_id, Option.is_correct)\
+            .outerjoin(UserAnswer, UserAnswer.score_id == Score.id)\
+            .outerjoin(Option, Option.id == UserAnswer.selected_option_id)
+    query = query.filter(Score.user_id == user_id).order_by(Score.id)
+    if detail:
+        query = query.order_by(UserAnswer.id)
+
+    # Write to a temporary file and swap it in, so a download never
+    # sees a half-written export.
+    tmp_path = filepath + '.tmp'
+    opener = gzip.open if compress else open
+    rows = 0
+    with opener(tmp_path, 'wt', newline='') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(fieldnames)
+        batch = []
+        for row in query.yield_per(EXPORT_BATCH_SIZE):
+            row = list(row)
+            row[2] = row[2].isoformat() if row[2] else ''
+            row[4] = row[4].isoformat() if row[4] else ''
+            batch.append(row)
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                writer.writerows(batch)
+                rows += len(batch)
+                batch = []
+        writer.writerows(batch)
+        rows += len(batch)
+    os.replace(tmp_path, filepath)
+    return rows
+
+
 @celery.task()
-def generate_csv_export(user_id):
+def generate_csv_export(user_id, detail=False, compress=False):
     """
     Generate a CSV of all quizzes attempted by a user and email it.
+    detail=True adds one row per answered question; compress=True writes
+    a .csv.gz.
     """
     with app.app_context():
         user = User.query.get(user_id)
         if not user:
             return f"No user found with ID {user_id}"
 
-        scores = Score.query.filter_by(user_id=user_id).all()
-        if not scores:
+        if not db.session.query(Score.id).filter_by(user_id=user_id).first():
             return "No quiz attempts found for user."
 
-       
-        filename = f'user_{user_id}_quiz_export.csv'
-        filepath = os.path.join('static', filename)
-
-        
+        filename = f'user_{user_id}_quiz_export.csv' + ('.gz' if compress else '')
         os.makedirs('static', exist_ok=True)
+        write_csv_export(user_id, os.path.join('static', filename), detail, compress)
+
+        send_messages(render_messages('csv_export', [{
+            'email': user.email,
+            'full_name': user.full_name,
+            'download_url': f"http://127.0.0.1:5000/static/{filename}",
+        }]))
+        return f"CSV generated and email sent to {user.email}"
+
+
+MAIL_CHUNK_SIZE = 1000
+MAIL_JOB_TIMEOUT = 7 * 24 * 60 * 60
+# How long a dispatched or sending chunk stays claimed. Beat re-runs the
+# coordinators every minute; only chunks whose lease has lapsed (e.g. their
+# worker died) are dispatched again.
+MAIL_CHUNK_LEASE = 60 * 60
+
+# Take over a chunk lease if it is unclaimed or already ours, unless the
+# chunk has been checkpointed as sent.
+CLAIM_CHUNK = redis_client.register_script("""
+if redis.call('HEXISTS', KEYS[2], ARGV[3]) == 1 then
+    return 0
+end
+local owner = redis.call('GET', KEYS[1])
+if owner and owner ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+return 1
+""")
+
+
+def inactive_users_query(cutoff, low, high):
+    """
+    Non-admin users with ids in [low, high) whose latest attempt is older
+    than `cutoff`, or who never attempted a quiz, as one grouped query over
+    the (user_id, timestamp) index.
+    """
+    last_attempt = db.session.query(
+        Score.user_id.label('user_id'),
+        func.max(Score.timestamp).label('last_attempt')
+    ).filter(Score.user_id >= low, Score.user_id < high)\
+        .group_by(Score.user_id).subquery()
+
+    return db.session.query(User.id, User.email, User.full_name)\
+        .outerjoin(last_attempt, last_attempt.c.user_id == User.id)\
+        .filter(User.role != 'admin', User.id >= low, User.id < high)\
+        .filter(or_(last_attempt.c.last_attempt.is_(None), last_attempt.c.last_attempt < cutoff))\
+        .order_by(User.id)
+
+
+def monthly_report_query(month, low, high):
+    """
+    Non-admin users with ids in [low, high) and their rollup row for `month`.
+    """
+    return db.session.query(
+        User.email, User.full_name, MonthlyActivity.attempt_count, MonthlyActivity.score_sum
+    ).outerjoin(
+        MonthlyActivity,
+        (MonthlyActivity.user_id == User.id) & (MonthlyActivity.month == month)
+    ).filter(User.role != 'admin', User.id >= low, User.id < high).order_by(User.id)
+
+
+def mail_job_key(run_id):
+    return f'mail_job:{run_id}'
+
+
+def chunk_lease_key(run_id, low):
+    return f'mail_job:{run_id}:lease:{low}'
+
+
+def mail_job_progress(run_id):
+    """
+    Return the stored progress of a mass-mail run, or None if unknown.
+    """
+    raw = redis_client.hgetall(mail_job_key(run_id))
+    if not raw:
+        return None
+    progress = {k.decode(): v.decode() for k, v in raw.items()}
+    chunks = {k: int(v) for k, v in progress.items() if k.startswith('chunk:')}
+    return {
+        'run_id': run_id,
+        'job': progress.get('job'),
+        'total_chunks': int(progress.get('total_chunks', 0)),
+        'done_chunks': len(chunks),
+        'sent': sum(chunks.values()),
+        'started_at': progress.get('started_at'),
+        'finished_at': progress.get('finished_at'),
+    }
+
+
+def user_id_chunks(chunk_size=MAIL_CHUNK_SIZE):
+    """
+    Split the non-admin user id range into [low, high) chunks aligned to
+    `chunk_size`, so a resumed run sees the same chunk boundaries.
+    """
+    low, high = db.session.query(func.min(User.id), func.max(User.id))\
+        .filter(User.role != 'admin').one()
+    if low is None:
+        return []
+    start = (low // chunk_size) * chunk_size
+    return [(lo, lo + chunk_size) for lo in range(start, high + 1, chunk_size)]
+
+
+def dispatch_mail_job(job, run_id, params):
+    """
+    Fan a mass-mail job out as a chord of chunk tasks. Chunks already
+    checkpointed for `run_id` are skipped, and each remaining chunk is
+    claimed with a lease before it is dispatched, so overlapping runs of
+    the coordinator never queue the same chunk twice.
+    """
+    key = mail_job_key(run_id)
+    chunks = user_id_chunks()
+    done = {k.decode() for k in redis_client.hkeys(key)}
+    token = uuid.uuid4().hex
+    pending = [
+        (lo, hi) for lo, hi in chunks
+        if f'chunk:{lo}' not in done
+        and redis_client.set(chunk_lease_key(run_id, lo), token, nx=True, ex=MAIL_CHUNK_LEASE)
+    ]
+
+    pipe = redis_client.pipeline()
+    pipe.hset(key, mapping={'job': job, 'total_chunks': len(chunks)})
+    pipe.hsetnx(key, 'started_at', datetime.utcnow().isoformat())
+    pipe.expire(key, MAIL_JOB_TIMEOUT)
+    pipe.execute()
+
+    if not pending:
+        return f"{run_id}: no unclaimed chunks of {len(chunks)}."
+    chord(
+        send_mail_chunk.s(job, run_id, lo, hi, params, token) for lo, hi in pending
+    )(finish_mail_job.s(run_id))
+    return f"{run_id}: dispatched {len(pending)} of {len(chunks)} chunks."
+
+
+@celery.task(bind=True, acks_late=True, max_retries=3, default_retry_delay=30)
+def send_mail_chunk(self, job, run_id, low, high, params, token):
+    """
+    Send one chunk of a mass-mail job and checkpoint it in redis. The task
+    renews the lease its coordinator took and gives up if the chunk was
+    sent or re-dispatched to someone else in the meantime.
+    """
+    key = mail_job_key(run_id)
+    field = f'chunk:{low}'
+    lease = chunk_lease_key(run_id, low)
+    if not CLAIM_CHUNK(keys=[lease, key], args=[token, MAIL_CHUNK_LEASE, field]):
+        return 0
 
-      
-        with open(filepath, 'w', newline='') as csvfile:
-            fieldnames = ['score_id', 'quiz_id', 'quiz_date', 'total_scored', 'timestamp']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-
-            for score in scores:
-                quiz = Quiz.query.get(score.quiz_id)
-                writer.writerow({
-                    'score_id': score.id,
-                    'quiz_id': score.quiz_id,
-                    'quiz_date': quiz.date_of_quiz.isoformat() if quiz and quiz.date_of_quiz else '',
-                    'total_scored': score.total_scored,
-                    'timestamp': score.timestamp.isoformat() if score.timestamp else ''
+    with app.app_context():
+        if job == 'reminder':
+            cutoff = datetime.fromisoformat(params['cutoff'])
+            messages = render_messages('reminder', [
+                {'email': email, 'full_name': full_name}
+                for _, email, full_name in inactive_users_query(cutoff, low, high)
+            ])
+        elif job == 'monthly_report':
+            month = datetime.fromisoformat(params['month']).date()
+            rows = []
+            for email, full_name, attempt_count, score_sum in monthly_report_query(month, low, high):
+                quiz_count = attempt_count or 0
+                rows.append({
+                    'email': email,
+                    'full_name': full_name,
+                    'quiz_count': quiz_count,
+                    'avg_score': score_sum / quiz_count if quiz_count > 0 else 0,
                 })
+            messages = render_messages('monthly_report', rows, month=params['month_name'])
+        else:
+            raise ValueError(f"Unknown mail job {job}")
 
-        
-        body = (
-            f"Hello {user.full_name},\n\n"
-            f"Your quiz export CSV is ready. Download it here:\n"
-            f"http://127.0.0.1:5000/static/{filename}\n\n"
-            f"Regards,\nQuiz Master Team"
-        )
+    try:
+        sent = send_messages(messages) if messages else 0
+    except Exception as exc:
+        raise self.retry(exc=exc)
 
-        send_mail(user.email, "Your Quiz Export CSV is Ready", body)
-        return f"CSV generated and email sent to {user.email}"
+    pipe = redis_client.pipeline()
+    pipe.hset(key, field, sent)
+    pipe.delete(lease)
+    pipe.execute()
+    return sent
+
+
+@celery.task()
+def finish_mail_job(results, run_id):
+    redis_client.hset(mail_job_key(run_id), 'finished_at', datetime.utcnow().isoformat())
+    return f"{run_id}: sent {sum(results)} messages."
 
 
 @celery.task()
 def daily_reminder_emails():
     """
     Send daily reminders to users who have not attempted any quiz in the last 7 days.
+
+    Runs as a chord of user-id chunks; each day is one resumable run.
     """
     with app.app_context():
-        users = User.query.filter(User.role != 'admin').all()
         now = datetime.utcnow()
         cutoff = now - timedelta(days=7)
+        run_id = f"reminder:{now.date().isoformat()}"
+        return dispatch_mail_job('reminder', run_id, {'cutoff': cutoff.isoformat()})
 
-        for user in users:
-            last_score = Score.query.filter_by(user_id=user.id).order_by(Score.timestamp.desc()).first()
-
-            if not last_score or last_score.timestamp < cutoff:
-                body = (
-                    f"Hello {user.full_name},\n\n"
-                    f"We noticed you haven't attempted any quizzes in the last week.\n"
-                    f"Visit Quiz Master and keep practicing your skills!\n"
-                    f"http://127.0.0.1:5173/\n\n"
-                    f"Best regards,\nQuiz Master Team"
-                )
-                send_mail(user.email, "Reminder: Come Back to Quiz Master!", body)
-
-        return "Daily reminders sent."
-
-
-from celery import Celery
-from celery.schedules import crontab
-
-celery = Celery('celery_app')
-celery.conf.broker_url = 'redis://localhost:6379/0'
-celery.conf.result_backend = 'redis://localhost:6379/0'
 
 @celery.task()
 def monthly_activity_report():
     """
     Send monthly activity reports with quiz stats to all users.
+
+    Stats come from the MonthlyActivity rollup; runs as a chord of user-id
+    chunks and each month is one resumable run.
     """
     with app.app_context():
-        users = User.query.filter(User.role != 'admin').all()
         now = datetime.utcnow()
         first_day_last_month = (now.replace(day=1) - timedelta(days=1)).replace(day=1)
-        last_day_last_month = now.replace(day=1) - timedelta(days=1)
-
-        for user in users:
-            scores = Score.query.filter(
-                Score.user_id == user.id,
-                Score.timestamp >= first_day_last_month,
-                Score.timestamp <= last_day_last_month
-            ).all()
+        run_id = f"monthly_report:{first_day_last_month.strftime('%Y-%m')}"
+        return dispatch_mail_job('monthly_report', run_id, {
+            'month': first_day_last_month.date().isoformat(),
+            'month_name': first_day_last_month.strftime('%B %Y'),
+        })
 
-            quiz_count = len(scores)
-            avg_score = sum(s.total_scored for s in scores) / quiz_count if quiz_count > 0 else 0
 
-            body = (
-                f"Hello {user.full_name},\n\n"
-                f"Here is your activity report for {first_day_last_month.strftime('%B %Y')}:\n"
-                f"Total quizzes taken: {quiz_count}\n"
-                f"Average score: {avg_score:.2f}%\n\n"
-                f"Keep up the great work!\n\n"
-                f"Regards,\nQuiz Master Team"
-            )
-            send_mail(user.email, f"Your Monthly Quiz Activity Report - {first_day_last_month.strftime('%B %Y')}", body)
+@celery.task()
+def rebuild_activity_rollups():
+    """
+    Rebuild the monthly activity, admin stats and score average rollups
+    from the existing User and Score history. A manual backfill, not
+    scheduled: writes and deletes keep the rollups current.
+    """
+    with app.app_context():
+        rebuild_rollups()
+        return "Activity rollups rebuilt."
 
-        return "Monthly reports sent."
 
+@celery.task()
+def rebuild_leaderboard_sets():
+    """
+    Rebuild the quiz, chapter and global leaderboards from the Score table.
+    """
+    with app.app_context():
+        count = rebuild_leaderboards()
+        return f"Rebuilt {count} leaderboards."
 
 
+def store_submissions(batch):
+    """
+    Write a batch of {(user_id, submission_key): record} in one transaction.
+    Returns the new scores and {(user_id, key): score_id} for keys that
+    already had a Score.
+    """
+    existing = {
+        (user_id, key): score_id
+        for user_id, key, score_id in db.session.query(Score.user_id, Score.submission_key, Score.id)
+        .filter(Score.submission_key.in_({k for _, k in batch})).all()
+        if (user_id, key) in batch
+    }
+    new_records = [r for k, r in batch.items() if k not in existing]
+
+    scores = [
+        Score(
+            quiz_id=r['quiz_id'],
+            user_id=r['user_id'],
+            timestamp=datetime.fromisoformat(r['timestamp']),
+            total_scored=r['total_scored'],
+            submission_key=r['submission_key']
+        )
+        for r in new_records
+    ]
+    db.session.add_all(scores)
+    db.session.flush()
+
+    answer_rows = [
+        {'score_id': score.id, 'question_id': question_id, 'selected_option_id': option_id}
+        for score, r in zip(scores, new_records)
+        for question_id, option_id in r['answers']
+    ]
+    if answer_rows:
+        db.session.execute(insert(UserAnswer), answer_rows)
+    record_attempts([(s.user_id, s.timestamp, s.total_scored) for s in scores])
+    db.session.commit()
+    return scores, existing
+
+
+def store_one_by_one(batch):
+    """
+    Store a batch that keeps failing record by record, dead-lettering the
+    records that fail on their own so they stop blocking the queue.
+    """
+    scores, existing = [], {}
+    for key, record in batch.items():
+        try:
+            stored, found = store_submissions({key: record})
+        except Exception as exc:
+            db.session.rollback()
+            logger.exception("Dead-lettering submission %s of user %s", key[1], key[0])
+            dead_letter(record, repr(exc))
+            continue
+        scores += stored
+        existing.update(found)
+    return scores, existing
+
+
+@celery.task(bind=True, acks_late=True, max_retries=5, default_retry_delay=2)
+def ingest_submissions(self):
+    """
+    Persist write-behind quiz submissions in batched transactions. Keys that
+    already have a Score are skipped, so retries never duplicate rows.
+
+    Batches sit on a processing list until their transaction commits, and
+    one run at a time holds the ingest lock. A run that finds entries left
+    on the processing list (its predecessor died) moves them back first.
+    A batch that has failed MAX_BATCH_FAILURES times is stored one record
+    at a time, and records that still fail go to the dead-letter list.
+    """
+    lock = ingest_lock()
+    if not lock.acquire():
+        return "Ingestion already running."
+    stored = 0
+    try:
+        recover_processing()
+        with app.app_context():
+            while True:
+                raw, records = take_batch()
+                if not records:
+                    break
+                lock.reacquire()
+
+                # Submission keys are only unique per user.
+                batch = {}
+                for record in records:
+                    batch.setdefault((record['user_id'], record['submission_key']), record)
+                try:
+                    scores, existing = store_submissions(batch)
+                except Exception as exc:
+                    db.session.rollback()
+                    if batch_failed() < MAX_BATCH_FAILURES:
+                        restore_batch(raw)
+                        raise self.retry(exc=exc)
+                    scores, existing = store_one_by_one(batch)
+                batch_stored()
+
+                append_scores(scores)
+                record_scores(scores)
+                for score in scores:
+                    mark_stored(score.user_id, score.submission_key, score.id)
+                for (user_id, key), score_id in existing.items():
+                    mark_stored(user_id, key, score_id)
+                ack_batch(raw)
+                stored += len(scores)
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            pass
+
+    if pending_count():
+        ingest_submissions.delay()
+    return f"Ingested {stored} submissions."
 
 
 celery.conf.beat_schedule = {
@@ -150,4 +471,13 @@ celery.conf.beat_schedule = {
         'task': 'celery_app.monthly_activity_report',
         'schedule': crontab(minute='*/1'),  
     },
+    # Picks up anything a crashed ingestion run left behind.
+    'ingest_submissions': {
+        'task': 'celery_app.ingest_submissions',
+        'schedule': crontab(minute='*/1'),
+    },
+    'rebuild_leaderboards': {
+        'task': 'celery_app.rebuild_leaderboard_sets',
+        'schedule': crontab(hour=2, minute=45),
+    },
 }
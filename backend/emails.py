@@ -0,0 +1,69 @@
+import os
+import threading
+
+from jinja2 import Environment, FileSystemLoader, StrictUndefined, select_autoescape
+
+from mail import build_message
+
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates', 'email')
+APP_URL = 'http://127.0.0.1:5173/'
+
+# Bump a version whenever its template files change so long-lived workers
+# compile the new copy instead of reusing the cached one.
+EMAIL_TEMPLATES = {
+    'reminder': {'version': 1, 'subject': "Reminder: Come Back to Quiz Master!"},
+    'monthly_report': {'version': 1, 'subject': "Your Monthly Quiz Activity Report - {{ month }}"},
+    'csv_export': {'version': 1, 'subject': "Your Quiz Export CSV is Ready"},
+}
+
+_env = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    autoescape=select_autoescape(['html']),
+    undefined=StrictUndefined,
+    auto_reload=False,
+)
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+
+def get_templates(name):
+    """
+    Return the compiled (subject, text, html) templates for `name`, compiled
+    once per process and version.
+    """
+    spec = EMAIL_TEMPLATES[name]
+    key = (name, spec['version'])
+    templates = _compiled.get(key)
+    if templates is None:
+        with _compiled_lock:
+            templates = _compiled.get(key)
+            if templates is None:
+                templates = (
+                    _env.from_string(spec['subject']),
+                    _env.get_template(f'{name}.txt'),
+                    _env.get_template(f'{name}.html'),
+                )
+                _compiled[key] = templates
+    return templates
+
+
+def render_messages(name, rows, **shared):
+    """
+    Render one multipart (text + HTML) message per row. Each row is a dict
+    with the recipient `email` plus its personal context; `shared` values
+    are merged into every row.
+    """
+    subject_template, text_template, html_template = get_templates(name)
+    shared.setdefault('app_url', APP_URL)
+
+    messages = []
+    for row in rows:
+        context = dict(shared, **row)
+        messages.append(build_message(
+            row['email'],
+            subject_template.render(context),
+            text_template.render(context),
+            html=html_template.render(context)
+        ))
+    return messages
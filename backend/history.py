@@ -0,0 +1,149 @@
+import json
+
+import redis
+
+from cache import redis_client
+from models import db, Quiz, Score
+
+
+HISTORY_TIMEOUT = 24 * 60 * 60
+HISTORY_GENERATION_KEY = 'score_history:generation'
+
+
+def history_key(user_id):
+    # Named apart from the older list-shaped score_history:<id> keys, which
+    # are left to expire.
+    return f'score_history_by_id:{user_id}'
+
+
+def history_seq_key(user_id):
+    return f'score_history_seq:{user_id}'
+
+
+def quiz_name(quiz_id, remarks):
+    return remarks if remarks else f"Quiz #{quiz_id}"
+
+
+# A cached history is a hash of score_id -> entry plus a generation field,
+# so appending an attempt the rebuild already picked up just overwrites it.
+GENERATION_FIELD = 'generation'
+
+# HSET only into a history that is already cached; a missing one is left
+# for the next read to rebuild.
+APPEND_IF_CACHED = redis_client.register_script("""
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+end
+""")
+
+
+def _entry(score_id, quiz_id, remarks, timestamp, total_scored):
+    return json.dumps([
+        score_id, quiz_id, quiz_name(quiz_id, remarks),
+        timestamp.isoformat() if timestamp else "", total_scored
+    ])
+
+
+def load_history(user_id):
+    """
+    Every attempt of a user with its quiz name, in one joined query, as
+    {score_id: entry}.
+    """
+    rows = db.session.query(
+        Score.id, Score.quiz_id, Quiz.remarks, Score.timestamp, Score.total_scored
+    ).outerjoin(Quiz, Quiz.id == Score.quiz_id)\
+        .filter(Score.user_id == user_id).all()
+    return {row[0]: _entry(*row) for row in rows}
+
+
+def _generation(value):
+    return value.decode() if value is not None else '0'
+
+
+def _decode(entries):
+    return sorted((json.loads(e) for e in entries), key=lambda e: e[0])
+
+
+def get_history(user_id):
+    """
+    Return a user's attempts as (score_id, quiz_id, quiz_name, timestamp,
+    total_scored) lists, oldest first.
+
+    The redis hash records the quiz-name generation it was built under,
+    so a warm read is one pipelined GET + HGETALL. Misses rebuild from the
+    database; the rebuild is only stored if no attempt was appended while it
+    ran, so a concurrent submit is never lost.
+    """
+    key = history_key(user_id)
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.get(HISTORY_GENERATION_KEY)
+    pipe.hgetall(key)
+    generation, cached = pipe.execute()
+    generation = _generation(generation)
+    cached_generation = cached.pop(GENERATION_FIELD.encode(), None)
+    if cached_generation is not None and cached_generation.decode() == generation:
+        return _decode(cached.values())
+
+    with redis_client.pipeline() as pipe:
+        pipe.watch(history_seq_key(user_id), HISTORY_GENERATION_KEY)
+        entries = load_history(user_id)
+        pipe.multi()
+        pipe.delete(key)
+        pipe.hset(key, mapping=dict(entries, **{GENERATION_FIELD: generation}))
+        pipe.expire(key, HISTORY_TIMEOUT)
+        try:
+            pipe.execute()
+        except redis.WatchError:
+            pass
+    return _decode(entries.values())
+
+
+def append_scores(scores):
+    """
+    Add newly committed scores to their users' cached histories. Users
+    without a cached history are left alone and rebuild on their next read.
+    Adding a score the history already holds is a no-op.
+    """
+    if not scores:
+        return
+    names = dict(
+        db.session.query(Quiz.id, Quiz.remarks)
+        .filter(Quiz.id.in_({s.quiz_id for s in scores})).all()
+    )
+    pipe = redis_client.pipeline()
+    for s in scores:
+        pipe.incr(history_seq_key(s.user_id))
+        pipe.expire(history_seq_key(s.user_id), HISTORY_TIMEOUT)
+        APPEND_IF_CACHED(
+            keys=[history_key(s.user_id)],
+            args=[s.id, _entry(s.id, s.quiz_id, names.get(s.quiz_id), s.timestamp, s.total_scored)],
+            client=pipe
+        )
+    pipe.execute()
+
+
+def histories_changed():
+    """
+    A quiz was renamed; retire every cached history at once.
+    """
+    redis_client.incr(HISTORY_GENERATION_KEY)
+
+
+def forget_histories(user_ids):
+    """
+    Scores of these users were deleted. Their histories are dropped, and
+    bumping their seq keys stops an in-flight rebuild from storing the
+    old attempts again.
+    """
+    if not user_ids:
+        return
+    pipe = redis_client.pipeline()
+    for user_id in user_ids:
+        pipe.incr(history_seq_key(user_id))
+        pipe.expire(history_seq_key(user_id), HISTORY_TIMEOUT)
+        pipe.delete(history_key(user_id))
+    pipe.execute()
+
+
+def drop_history(user_id):
+    redis_client.delete(history_key(user_id))
@@ -0,0 +1,206 @@
+from sqlalchemy import func
+
+from cache import redis_client
+from models import db, Quiz, Score, User
+
+
+LEADERBOARD_LIMIT = 10
+MAX_LEADERBOARD_LIMIT = 100
+REBUILD_CHUNK = 1000
+LEADERBOARD_SCOPES = ('global', 'chapter', 'quiz')
+
+# A quiz board holds each user's best score on that quiz. Chapter and
+# global boards hold the sum of a user's best scores over their quizzes,
+# so only an improved best moves them, by the improvement.
+RECORD_BEST = redis_client.register_script("""
+local old = redis.call('ZSCORE', KEYS[1], ARGV[1])
+local new = tonumber(ARGV[2])
+if old and tonumber(old) >= new then
+    return 0
+end
+local delta = new - (tonumber(old) or 0)
+redis.call('ZADD', KEYS[1], new, ARGV[1])
+redis.call('ZINCRBY', KEYS[2], delta, ARGV[1])
+redis.call('ZINCRBY', KEYS[3], delta, ARGV[1])
+return 1
+""")
+
+# A quiz is gone: take each user's best on it back out of the chapter and
+# global boards, then drop the quiz board. Users left with nothing on a
+# board are removed from it.
+FORGET_QUIZ = redis_client.register_script("""
+local entries = redis.call('ZRANGE', KEYS[1], 0, -1, 'WITHSCORES')
+for i = 1, #entries, 2 do
+    for _, key in ipairs({KEYS[2], KEYS[3]}) do
+        if tonumber(redis.call('ZINCRBY', key, -tonumber(entries[i + 1]), entries[i])) <= 0 then
+            redis.call('ZREM', key, entries[i])
+        end
+    end
+end
+redis.call('DEL', KEYS[1])
+return #entries / 2
+""")
+
+
+def board_key(scope, board_id=None):
+    if scope == 'global':
+        return 'leaderboard:global'
+    return f'leaderboard:{scope}:{board_id}'
+
+
+def record_scores(scores):
+    """
+    Fold newly committed scores into the quiz, chapter and global boards.
+    Each update is one atomic script call, so concurrent submits by the
+    same user cannot double count.
+    """
+    if not scores:
+        return
+    chapters = dict(
+        db.session.query(Quiz.id, Quiz.chapter_id)
+        .filter(Quiz.id.in_({s.quiz_id for s in scores})).all()
+    )
+    pipe = redis_client.pipeline(transaction=False)
+    for s in scores:
+        chapter_id = chapters.get(s.quiz_id)
+        if chapter_id is None:
+            continue
+        RECORD_BEST(
+            keys=[board_key('quiz', s.quiz_id), board_key('chapter', chapter_id), board_key('global')],
+            args=[s.user_id, s.total_scored or 0],
+            client=pipe
+        )
+    pipe.execute()
+
+
+def boards_for_quizzes(quiz_ids):
+    """
+    The (quiz_id, chapter_id) of each quiz, read before a delete cascades
+    them away.
+    """
+    if not quiz_ids:
+        return []
+    return db.session.query(Quiz.id, Quiz.chapter_id).filter(Quiz.id.in_(quiz_ids)).all()
+
+
+def forget_quizzes(quizzes):
+    """
+    Take deleted quizzes, as returned by boards_for_quizzes, off the
+    boards. Each quiz is one atomic script call, so a concurrent submit
+    cannot be subtracted twice.
+    """
+    if not quizzes:
+        return
+    pipe = redis_client.pipeline(transaction=False)
+    for quiz_id, chapter_id in quizzes:
+        FORGET_QUIZ(
+            keys=[board_key('quiz', quiz_id), board_key('chapter', chapter_id), board_key('global')],
+            client=pipe
+        )
+    pipe.execute()
+
+
+def boards_of_user(user_id):
+    """
+    Every board a user can be on, read before the user is deleted.
+    """
+    rows = db.session.query(Score.quiz_id, Quiz.chapter_id).join(Quiz, Quiz.id == Score.quiz_id)\
+        .filter(Score.user_id == user_id).distinct().all()
+    keys = {board_key('global')}
+    for quiz_id, chapter_id in rows:
+        keys.add(board_key('quiz', quiz_id))
+        keys.add(board_key('chapter', chapter_id))
+    return keys
+
+
+def forget_user_boards(user_id, keys):
+    pipe = redis_client.pipeline(transaction=False)
+    for key in keys:
+        pipe.zrem(key, user_id)
+    pipe.execute()
+
+
+def top(scope, board_id=None, limit=LEADERBOARD_LIMIT):
+    """
+    The first `limit` entries of a board with user names, highest first.
+    """
+    entries = redis_client.zrevrange(board_key(scope, board_id), 0, limit - 1, withscores=True)
+    user_ids = [int(member) for member, _ in entries]
+    names = dict(
+        db.session.query(User.id, User.full_name).filter(User.id.in_(user_ids)).all()
+    ) if user_ids else {}
+    return [
+        {
+            'rank': rank,
+            'user_id': user_id,
+            'full_name': names.get(user_id) or f"User #{user_id}",
+            'score': round(score, 2)
+        }
+        for rank, (user_id, (_, score)) in enumerate(zip(user_ids, entries), start=1)
+    ]
+
+
+def rank_of(scope, board_id, user_id):
+    """
+    A user's 1-based rank and score on a board, plus the board size.
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    key = board_key(scope, board_id)
+    pipe.zrevrank(key, user_id)
+    pipe.zscore(key, user_id)
+    pipe.zcard(key)
+    rank, score, total = pipe.execute()
+    return {
+        'rank': rank + 1 if rank is not None else None,
+        'score': round(score, 2) if score is not None else None,
+        'total': total
+    }
+
+
+def rebuild_leaderboards():
+    """
+    Rebuild every board from each user's best score per quiz. Boards are
+    written under temporary keys and renamed into place, and boards whose
+    quiz or chapter no longer has scores are dropped.
+
+    Submits recorded on the live boards while the rebuild runs would be
+    overwritten by the rename, so scores newer than the snapshot are
+    replayed through record_scores afterwards. Replaying a score the
+    rebuild already counted changes nothing.
+    """
+    last_score_id = db.session.query(func.max(Score.id)).scalar() or 0
+    best = db.session.query(
+        Score.user_id, Score.quiz_id, Quiz.chapter_id, func.max(Score.total_scored)
+    ).join(Quiz, Quiz.id == Score.quiz_id)\
+        .filter(Score.id <= last_score_id)\
+        .group_by(Score.user_id, Score.quiz_id, Quiz.chapter_id)\
+        .yield_per(REBUILD_CHUNK)
+
+    boards = {}
+    for user_id, quiz_id, chapter_id, score in best:
+        score = score or 0
+        for key in (board_key('quiz', quiz_id), board_key('chapter', chapter_id), board_key('global')):
+            board = boards.setdefault(key, {})
+            board[user_id] = board.get(user_id, 0) + score
+
+    pipe = redis_client.pipeline(transaction=False)
+    for key, board in boards.items():
+        items = list(board.items())
+        pipe.delete(f'{key}:rebuild')
+        for i in range(0, len(items), REBUILD_CHUNK):
+            pipe.zadd(f'{key}:rebuild', dict(items[i:i + REBUILD_CHUNK]))
+    pipe.execute()
+
+    pipe = redis_client.pipeline()
+    for key in redis_client.scan_iter(match='leaderboard:*'):
+        key = key.decode()
+        if key not in boards and not key.endswith(':rebuild'):
+            pipe.delete(key)
+    for key in boards:
+        pipe.rename(f'{key}:rebuild', key)
+    pipe.execute()
+
+    newer = Score.query.filter(Score.id > last_score_id).order_by(Score.id).all()
+    for i in range(0, len(newer), REBUILD_CHUNK):
+        record_scores(newer[i:i + REBUILD_CHUNK])
+    return len(boards)
@@ -1,4 +1,10 @@
+import logging
+import queue
 import smtplib
+import threading
+import time
+from collections import deque
+from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 
 
@@ -6,14 +12,161 @@ SMTP_HOST = 'localhost'
 SMTP_PORT = 1025
 FROM_EMAIL = 'admin@quizmaster.com'
 
-def send_mail(to, subject, body):
+SMTP_POOL_SIZE = 4
+SMTP_TIMEOUT = 10
+# Messages per second allowed to any single recipient domain.
+DOMAIN_RATE_LIMIT = 50
+
+logger = logging.getLogger(__name__)
+
+
+class DomainRateLimiter:
     """
-    Send an email via Mailhog SMTP server.
+    Spaces out deliveries so no recipient domain gets more than `rate`
+    messages per second from this process.
     """
-    msg = MIMEText(body)
+
+    def __init__(self, rate=DOMAIN_RATE_LIMIT):
+        self.interval = 1.0 / rate if rate else 0
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def wait(self, address):
+        if not self.interval:
+            return
+        domain = address.rsplit('@', 1)[-1].lower()
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(domain, now))
+            self._next[domain] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class SMTPPool:
+    """
+    A bounded pool of reusable SMTP connections. Batches are sent over a
+    single connection, which is re-opened once if the server drops it.
+    """
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, size=SMTP_POOL_SIZE,
+                 timeout=SMTP_TIMEOUT, rate_limiter=None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter or DomainRateLimiter()
+        self.batch_timings = deque(maxlen=100)
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        return smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    def _acquire(self):
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, server, healthy):
+        if healthy:
+            self._idle.put(server)
+        else:
+            self._close(server)
+        self._slots.release()
+
+    def send_batch(self, messages):
+        """
+        Deliver `messages` over one pooled connection. Returns the number
+        sent; failures are logged and skipped.
+        """
+        started = time.perf_counter()
+        sent = failed = 0
+        server = self._acquire()
+        healthy = True
+        try:
+            for msg in messages:
+                self.rate_limiter.wait(msg['To'])
+                try:
+                    if not healthy:
+                        server = self._connect()
+                        healthy = True
+                    try:
+                        server.send_message(msg)
+                    except (smtplib.SMTPServerDisconnected, ConnectionError):
+                        self._close(server)
+                        healthy = False
+                        server = self._connect()
+                        healthy = True
+                        server.send_message(msg)
+                    sent += 1
+                except (smtplib.SMTPException, OSError):
+                    failed += 1
+                    logger.exception("Failed to send mail to %s", msg['To'])
+        finally:
+            self._release(server, healthy)
+
+        timing = {'messages': len(messages), 'sent': sent, 'failed': failed,
+                  'seconds': time.perf_counter() - started}
+        self.batch_timings.append(timing)
+        logger.info("SMTP batch: %(sent)d sent, %(failed)d failed in %(seconds).3fs", timing)
+        return sent
+
+    def close(self):
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SMTPPool()
+        return _pool
+
+
+def build_message(to, subject, body, html=None):
+    if html is None:
+        msg = MIMEText(body)
+    else:
+        msg = MIMEMultipart('alternative')
+        msg.attach(MIMEText(body, 'plain'))
+        msg.attach(MIMEText(html, 'html'))
     msg['Subject'] = subject
     msg['From'] = FROM_EMAIL
     msg['To'] = to
+    return msg
+
 
-    with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-        server.send_message(msg)
+def send_messages(messages):
+    """
+    Send a batch of prepared messages over the shared connection pool.
+    """
+    return get_pool().send_batch(messages)
+
+
+def send_mail(to, subject, body):
+    """
+    Send an email via Mailhog SMTP server.
+    """
+    send_messages([build_message(to, subject, body)])
@@ -0,0 +1,116 @@
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from models import db
+from search import search_ddl
+
+
+def add_score_submission_key(conn):
+    columns = {c['name'] for c in inspect(conn).get_columns('score')}
+    if 'submission_key' not in columns:
+        conn.execute(text('ALTER TABLE score ADD COLUMN submission_key VARCHAR(64)'))
+    conn.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS ix_score_submission_key ON score (submission_key)'
+    ))
+
+
+def add_hot_path_indexes(conn):
+    for statement in (
+        'CREATE INDEX IF NOT EXISTS ix_chapter_subject_id ON chapter (subject_id)',
+        'CREATE INDEX IF NOT EXISTS ix_quiz_chapter_id ON quiz (chapter_id)',
+        'CREATE INDEX IF NOT EXISTS ix_question_quiz_id ON question (quiz_id)',
+        'CREATE INDEX IF NOT EXISTS ix_option_question_id ON option (question_id)',
+        'CREATE INDEX IF NOT EXISTS ix_score_quiz_id ON score (quiz_id)',
+        'CREATE INDEX IF NOT EXISTS ix_score_user_id_timestamp ON score (user_id, timestamp)',
+        'CREATE INDEX IF NOT EXISTS ix_user_answer_score_id ON user_answer (score_id)',
+    ):
+        conn.execute(text(statement))
+
+
+def add_user_created_at(conn):
+    columns = {c['name'] for c in inspect(conn).get_columns('user')}
+    if 'created_at' not in columns:
+        conn.execute(text('ALTER TABLE "user" ADD COLUMN created_at DATETIME'))
+    conn.execute(text('CREATE INDEX IF NOT EXISTS ix_user_created_at ON "user" (created_at)'))
+
+
+def scope_submission_key_to_user(conn):
+    conn.execute(text('DROP INDEX IF EXISTS ix_score_submission_key'))
+    conn.execute(text(
+        'CREATE UNIQUE INDEX IF NOT EXISTS ix_score_user_id_submission_key '
+        'ON score (user_id, submission_key)'
+    ))
+
+
+def add_search_index(conn):
+    if conn.dialect.name != 'sqlite':
+        return
+    for statement in search_ddl():
+        conn.execute(text(statement))
+
+
+def rebuild_search_index(conn):
+    # Rowids moved to per-kind ranges and ranking weights were added.
+    if conn.dialect.name != 'sqlite':
+        return
+    conn.execute(text('DROP TABLE IF EXISTS search_index'))
+    add_search_index(conn)
+
+
+def backfill_user_created_at(conn):
+    # Users from before migration 3 have no created_at and were invisible
+    # to the registrations chart. Date them to this migration and count
+    # them, so the incremental rollup matches rebuild_rollups().
+    now = datetime.utcnow()
+    backfilled = conn.execute(
+        text('UPDATE "user" SET created_at = :now WHERE created_at IS NULL'), {'now': now}
+    ).rowcount
+    if not backfilled:
+        return
+    updated = conn.execute(
+        text('UPDATE daily_registrations SET count = count + :n WHERE day = :day'),
+        {'n': backfilled, 'day': now.date()}
+    ).rowcount
+    if not updated:
+        conn.execute(
+            text('INSERT INTO daily_registrations (day, count) VALUES (:day, :n)'),
+            {'n': backfilled, 'day': now.date()}
+        )
+
+
+# Ordered, append-only. Each step must be idempotent because a fresh
+# database already gets the model's columns and indexes from create_all().
+MIGRATIONS = [
+    (1, 'score submission_key', add_score_submission_key),
+    (2, 'hot path indexes', add_hot_path_indexes),
+    (3, 'user created_at', add_user_created_at),
+    (4, 'full-text search index', add_search_index),
+    (5, 'score submission_key per user', scope_submission_key_to_user),
+    (6, 'search index per-kind rowid ranges', rebuild_search_index),
+    (7, 'backfill user created_at', backfill_user_created_at),
+]
+
+
+def run_migrations():
+    """
+    Apply pending schema migrations, recording each in schema_migrations.
+    Must be called inside an app context after db.create_all().
+    """
+    applied = []
+    with db.engine.begin() as conn:
+        conn.execute(text(
+            'CREATE TABLE IF NOT EXISTS schema_migrations '
+            '(version INTEGER PRIMARY KEY, name VARCHAR(255), applied_at DATETIME)'
+        ))
+        done = {row[0] for row in conn.execute(text('SELECT version FROM schema_migrations'))}
+        for version, name, migrate in MIGRATIONS:
+            if version in done:
+                continue
+            migrate(conn)
+            conn.execute(
+                text('INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)'),
+                {'v': version, 'n': name, 't': datetime.utcnow()}
+            )
+            applied.append(version)
+    return applied
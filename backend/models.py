@@ -12,6 +12,7 @@ class User(db.Model):
     dob = db.Column(db.Date, nullable=True)
     active = db.Column(db.Boolean(), default=True)
     role = db.Column(db.String(50), default='user')  
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
 
 class Subject(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -23,7 +24,7 @@ class Subject(db.Model):
 
 class Chapter(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subject.id'), nullable=False, index=True)
     name = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text)
     quizzes = db.relationship(
@@ -32,7 +33,7 @@ class Chapter(db.Model):
 
 class Quiz(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=False)
+    chapter_id = db.Column(db.Integer, db.ForeignKey('chapter.id'), nullable=False, index=True)
     date_of_quiz = db.Column(db.DateTime, default=datetime.utcnow)
     time_duration = db.Column(db.Integer)  
     remarks = db.Column(db.Text)
@@ -45,7 +46,7 @@ class Quiz(db.Model):
 
 class Question(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False, index=True)
     question_statement = db.Column(db.Text, nullable=False)
     options = db.relationship(
         'Option', backref='question', lazy=True, cascade="all, delete-orphan"
@@ -53,23 +54,65 @@ class Question(db.Model):
 
 class Option(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    question_id = db.Column(db.Integer, db.ForeignKey('question.id'), nullable=False)
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id'), nullable=False, index=True)
     text = db.Column(db.String(255), nullable=False)
     is_correct = db.Column(db.Boolean, default=False)
 
 
 class Score(db.Model):
+    __table_args__ = (
+        db.Index('ix_score_user_id_timestamp', 'user_id', 'timestamp'),
+        db.Index('ix_score_user_id_submission_key', 'user_id', 'submission_key', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
-    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quiz.id'), nullable=False, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     total_scored = db.Column(db.Float, default=0.0)
+    submission_key = db.Column(db.String(64), nullable=True)
     user_answers = db.relationship('UserAnswer', backref='score', lazy=True, cascade="all, delete-orphan")
 
 
 class UserAnswer(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    score_id = db.Column(db.Integer, db.ForeignKey('score.id'), nullable=False)
+    score_id = db.Column(db.Integer, db.ForeignKey('score.id'), nullable=False, index=True)
     question_id = db.Column(db.Integer, db.ForeignKey('question.id'), nullable=False)
     selected_option_id = db.Column(db.Integer, db.ForeignKey('option.id'), nullable=False)
+    question = db.relationship('Question', lazy=True)
+    selected_option = db.relationship('Option', lazy=True)
+
+
+
+class MonthlyActivity(db.Model):
+    """
+    Per-user, per-month attempt rollup, maintained on submit.
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    month = db.Column(db.Date, primary_key=True)
+    attempt_count = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Float, nullable=False, default=0.0)
+    score_min = db.Column(db.Float)
+    score_max = db.Column(db.Float)
+    last_attempt = db.Column(db.DateTime)
+
+
+class DailyRegistrations(db.Model):
+    day = db.Column(db.Date, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class WeeklyAttempts(db.Model):
+    # Monday of the ISO week.
+    week = db.Column(db.Date, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
 
+class UserScoreAverage(db.Model):
+    """
+    Running per-user score average, maintained on submit.
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    attempt_count = db.Column(db.Integer, nullable=False, default=0)
+    score_sum = db.Column(db.Float, nullable=False, default=0.0)
+    avg_score = db.Column(db.Float, nullable=False, default=0.0, index=True)
@@ -0,0 +1,148 @@
+import base64
+import json
+from datetime import date, datetime
+
+from flask import request, jsonify
+from sqlalchemy import and_, or_
+
+from streaming import stream_rows, STREAM_FORMATS
+
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, default=lambda v: v.isoformat()).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, TypeError):
+        raise PaginationError('Invalid cursor')
+
+
+def coerce(column, value):
+    """
+    Convert a query-string or cursor value to the Python type of `column`.
+    """
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    try:
+        if python_type is bool:
+            return str(value).lower() in ('1', 'true', 'yes')
+        if python_type is datetime:
+            return datetime.fromisoformat(value)
+        if python_type is date:
+            return date.fromisoformat(value)
+        return python_type(value)
+    except (TypeError, ValueError):
+        raise PaginationError(f'Invalid value for {column.key}')
+
+
+def apply_filters(query, filterable):
+    """
+    Add an equality filter for every `filterable` parameter in the request.
+    """
+    for name, column in (filterable or {}).items():
+        value = request.args.get(name)
+        if value not in (None, ''):
+            query = query.filter(column == coerce(column, value))
+    return query
+
+
+def parse_limit():
+    try:
+        limit = int(request.args.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise PaginationError('Invalid limit')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def keyset_page(query, model, sortable, filterable=None):
+    """
+    Apply the request's filter, sort, `after` and `limit` parameters to
+    `query` using keyset pagination on (sort column, id).
+
+    `sortable` and `filterable` map public parameter names to columns; sort
+    accepts a leading '-' for descending order. Returns
+    (items, next_cursor, total) where total is only counted on ?count=1.
+    """
+    query = apply_filters(query, filterable)
+    total = query.order_by(None).count() if request.args.get('count') == '1' else None
+
+    sort = request.args.get('sort', 'id')
+    descending = sort.startswith('-')
+    sort_name = sort.lstrip('-')
+    if sort_name not in sortable:
+        raise PaginationError(f'Cannot sort by {sort_name}')
+    sort_column = sortable[sort_name]
+    id_column = model.id
+
+    after = request.args.get('after')
+    if after:
+        values = decode_cursor(after)
+        if not isinstance(values, list) or len(values) != 2:
+            raise PaginationError('Invalid cursor')
+        last_value, last_id = coerce(sort_column, values[0]), coerce(id_column, values[1])
+        if sort_column is id_column:
+            query = query.filter(id_column < last_id if descending else id_column > last_id)
+        elif descending:
+            query = query.filter(or_(sort_column < last_value,
+                                     and_(sort_column == last_value, id_column < last_id)))
+        else:
+            query = query.filter(or_(sort_column > last_value,
+                                     and_(sort_column == last_value, id_column > last_id)))
+
+    query = query.order_by(None)
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column.asc(), id_column.asc())
+
+    limit = parse_limit()
+    items = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, sort_column.key), last.id])
+    return items, next_cursor, total
+
+
+def list_response(query, model, serialize, sortable, filterable=None, export=None):
+    """
+    Serialize one keyset page of `query` as a JSON list. The cursor for the
+    next page goes in X-Next-Cursor and the optional total in X-Total-Count.
+    Passing ?all=1 keeps the legacy unpaginated response.
+
+    When `export` is a (filename, fieldnames) pair, ?format=ndjson or
+    ?format=csv streams every matching row instead.
+    """
+    fmt = request.args.get('format')
+    try:
+        if fmt:
+            if fmt not in STREAM_FORMATS or not export:
+                raise PaginationError(f'Unsupported format {fmt}')
+            filename, fieldnames = export
+            query = apply_filters(query, filterable).order_by(None).order_by(model.id)
+            return stream_rows(query, serialize, fieldnames, fmt, filename)
+        if request.args.get('all') == '1':
+            return jsonify([serialize(o) for o in apply_filters(query, filterable).all()])
+        items, next_cursor, total = keyset_page(query, model, sortable, filterable)
+    except PaginationError as e:
+        return jsonify({'msg': str(e)}), 400
+
+    response = jsonify([serialize(o) for o in items])
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    if total is not None:
+        response.headers['X-Total-Count'] = str(total)
+    return response
@@ -0,0 +1,233 @@
+import json
+import threading
+from collections import OrderedDict
+
+from sqlalchemy.orm import selectinload
+
+from cache import cache, version_key, get_version, bump_version
+from models import db, Question, Option, Score, UserAnswer
+
+
+PAPER_TIMEOUT = 60 * 60
+ANSWER_KEY_TIMEOUT = 60 * 60
+ANSWER_KEY_LRU_SIZE = 256
+REVIEW_TIMEOUT = 24 * 60 * 60
+
+_answer_keys = OrderedDict()
+_answer_keys_lock = threading.Lock()
+
+
+def quiz_tag(quiz_id):
+    return f'quiz:{quiz_id}'
+
+
+def paper_key(quiz_id):
+    return f'quiz_paper:{quiz_id}'
+
+
+def answer_key_key(quiz_id):
+    return f'answer_key:{quiz_id}'
+
+
+def review_key(score_id):
+    return f'score_review:{score_id}'
+
+
+def build_quiz_paper(quiz_id):
+    """
+    Serialize the student-facing quiz paper. Options are select-in loaded so
+    this costs two queries regardless of quiz length; is_correct is never
+    included.
+    """
+    questions = Question.query.options(selectinload(Question.options))\
+        .filter_by(quiz_id=quiz_id).order_by(Question.id).all()
+    results = []
+    for q in questions:
+        results.append({
+            'id': q.id,
+            'quiz_id': q.quiz_id,
+            'question_statement': q.question_statement,
+            'options': [
+                {
+                    'id': o.id,
+                    'text': o.text,
+                } for o in sorted(q.options, key=lambda o: o.id)
+            ]
+        })
+    return json.dumps(results).encode('utf-8')
+
+
+def get_quiz_paper(quiz_id):
+    """
+    Return the pre-serialized JSON bytes of a quiz paper. A warm fetch is a
+    single MGET of the quiz version and the cached paper.
+    """
+    version, entry = cache.get_many(version_key(quiz_tag(quiz_id)), paper_key(quiz_id))
+    if entry is not None and version is not None and entry.get('version') == version:
+        return entry['body']
+
+    # Read the version before building so a concurrent admin write makes
+    # this entry stale instead of letting it mask the newer content.
+    version = get_version(quiz_tag(quiz_id))
+    body = build_quiz_paper(quiz_id)
+    cache.set(paper_key(quiz_id), {'version': version, 'body': body}, timeout=PAPER_TIMEOUT)
+    return body
+
+
+def invalidate_quiz(*quiz_ids):
+    """
+    Bump the version of every given quiz so cached papers are rebuilt.
+    """
+    for quiz_id in set(quiz_ids):
+        if quiz_id is not None:
+            bump_version(quiz_tag(quiz_id))
+            with _answer_keys_lock:
+                _answer_keys.pop(str(quiz_id), None)
+
+
+def load_answer_key(quiz_id):
+    """
+    Load the answer key of a quiz in one query as
+    {question_id: (correct_option_ids, valid_option_ids)}.
+    """
+    rows = db.session.query(Option.question_id, Option.id, Option.is_correct)\
+        .join(Question, Question.id == Option.question_id)\
+        .filter(Question.quiz_id == quiz_id).all()
+    key = {}
+    for question_id, option_id, is_correct in rows:
+        correct, valid = key.setdefault(question_id, (set(), set()))
+        valid.add(option_id)
+        if is_correct:
+            correct.add(option_id)
+    return {qid: (frozenset(c), frozenset(v)) for qid, (c, v) in key.items()}
+
+
+def get_answer_key(quiz_id):
+    """
+    Return the answer key of a quiz without touching the database when warm.
+    Keys live in a per-process LRU and are mirrored in redis; both copies
+    are tagged with the quiz version so question/option edits invalidate
+    them.
+    """
+    local_key = str(quiz_id)
+    version, entry = cache.get_many(version_key(quiz_tag(quiz_id)), answer_key_key(quiz_id))
+
+    if version is not None:
+        with _answer_keys_lock:
+            local = _answer_keys.get(local_key)
+            if local is not None and local[0] == version:
+                _answer_keys.move_to_end(local_key)
+                return local[1]
+
+    if entry is None or version is None or entry.get('version') != version:
+        version = get_version(quiz_tag(quiz_id))
+        entry = {'version': version, 'key': load_answer_key(quiz_id)}
+        cache.set(answer_key_key(quiz_id), entry, timeout=ANSWER_KEY_TIMEOUT)
+
+    with _answer_keys_lock:
+        _answer_keys[local_key] = (entry['version'], entry['key'])
+        _answer_keys.move_to_end(local_key)
+        while len(_answer_keys) > ANSWER_KEY_LRU_SIZE:
+            _answer_keys.popitem(last=False)
+    return entry['key']
+
+
+def _as_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class GradingError(ValueError):
+    pass
+
+
+def grade_answers(answer_key, answers):
+    """
+    Score a submitted answer list in memory. Returns
+    (total_questions, total_correct, graded) where graded holds the
+    (question_id, selected_option_id) pairs to persist.
+
+    Raises GradingError for a question that is not in the quiz, an option
+    that does not belong to its question, or a question answered twice.
+    """
+    total_questions = 0
+    total_correct = 0
+    graded = []
+    seen = set()
+    for answer in answers:
+        question_id = _as_id(answer.get('question_id'))
+        selected_option_id = _as_id(answer.get('selected_option_id'))
+        if not question_id or not selected_option_id:
+            continue
+        if question_id not in answer_key:
+            raise GradingError(f'Question {question_id} is not part of this quiz')
+        correct, valid = answer_key[question_id]
+        if selected_option_id not in valid:
+            raise GradingError(f'Option {selected_option_id} does not belong to question {question_id}')
+        if question_id in seen:
+            raise GradingError(f'Question {question_id} answered more than once')
+        seen.add(question_id)
+        if selected_option_id in correct:
+            total_correct += 1
+        total_questions += 1
+        graded.append((question_id, selected_option_id))
+    return total_questions, total_correct, graded
+
+
+def build_score_review(score_id):
+    """
+    Load a graded attempt with its answers, their questions and every
+    option in four queries. Returns None if the score is gone.
+    """
+    score = Score.query.options(
+        selectinload(Score.user_answers)
+        .selectinload(UserAnswer.question)
+        .selectinload(Question.options)
+    ).filter_by(id=score_id).first()
+    if not score:
+        return None
+
+    answers = []
+    for ua in sorted(score.user_answers, key=lambda ua: ua.id):
+        q = ua.question
+        answers.append({
+            'question_id': ua.question_id,
+            'question_statement': q.question_statement if q else "",
+            'selected_option_id': ua.selected_option_id,
+            'options': [
+                {'id': o.id, 'text': o.text, 'is_correct': o.is_correct}
+                for o in sorted(q.options, key=lambda o: o.id)
+            ] if q else []
+        })
+    body = json.dumps({
+        'score_id': score.id,
+        'quiz_id': score.quiz_id,
+        'timestamp': score.timestamp.isoformat() if score.timestamp else "",
+        'total_scored': score.total_scored,
+        'answers': answers
+    }).encode('utf-8')
+    return {'user_id': str(score.user_id), 'quiz_id': score.quiz_id, 'body': body}
+
+
+def get_score_review(score_id, user_id):
+    """
+    Return the review JSON of one of `user_id`'s attempts, or None. Graded
+    attempts never change, so reviews are cached per score and only rebuilt
+    when the quiz's questions or options are edited.
+    """
+    entry = cache.get(review_key(score_id))
+    if entry is not None and cache.get(version_key(quiz_tag(entry['quiz_id']))) != entry['version']:
+        entry = None
+
+    if entry is None:
+        entry = build_score_review(score_id)
+        if entry is None:
+            return None
+        entry['version'] = get_version(quiz_tag(entry['quiz_id']))
+        cache.set(review_key(score_id), entry, timeout=REVIEW_TIMEOUT)
+
+    if entry['user_id'] != str(user_id):
+        return None
+    return entry['body']
@@ -0,0 +1,220 @@
+from datetime import timedelta
+
+from sqlalchemy import bindparam, case, delete, func, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import (
+    db, DailyRegistrations, MonthlyActivity, Score, User, UserScoreAverage, WeeklyAttempts
+)
+
+
+BACKFILL_BATCH_SIZE = 1000
+UPSERT_CHUNK_SIZE = 500
+
+
+def month_of(timestamp):
+    return timestamp.date().replace(day=1)
+
+
+def week_of(timestamp):
+    day = timestamp.date()
+    return day - timedelta(days=day.weekday())
+
+
+def _dialect_functions():
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return postgresql.insert, func.least, func.greatest
+    return sqlite.insert, func.min, func.max
+
+
+def _upsert(model, rows, merge):
+    """
+    INSERT `rows` into `model`, merging into existing rows with the
+    expressions returned by merge(table, excluded).
+    """
+    insert, _, _ = _dialect_functions()
+    table = model.__table__
+    # Chunked to stay under SQLite's bound-parameter limit.
+    for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        stmt = insert(model).values(rows[i:i + UPSERT_CHUNK_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(table.primary_key.columns),
+            set_=merge(table.c, stmt.excluded)
+        )
+        db.session.execute(stmt)
+
+
+def _add_counts(model, key, counts):
+    _upsert(model, [{key: k, 'count': v} for k, v in counts.items()],
+            lambda c, excluded: {'count': c.count + excluded.count})
+
+
+def _aggregate(attempts):
+    monthly = {}
+    weekly = {}
+    per_user = {}
+    for user_id, timestamp, total_scored in attempts:
+        user_id = int(user_id)
+        key = (user_id, month_of(timestamp))
+        count, total, low, high, last = monthly.get(key, (0, 0.0, total_scored, total_scored, timestamp))
+        monthly[key] = (
+            count + 1,
+            total + total_scored,
+            min(low, total_scored),
+            max(high, total_scored),
+            max(last, timestamp),
+        )
+        week = week_of(timestamp)
+        weekly[week] = weekly.get(week, 0) + 1
+        count, total = per_user.get(user_id, (0, 0.0))
+        per_user[user_id] = (count + 1, total + total_scored)
+    return monthly, weekly, per_user
+
+
+def record_attempts(attempts):
+    """
+    Fold (user_id, timestamp, total_scored) attempts into the monthly
+    activity, weekly attempt and per-user average rollups in the caller's
+    transaction.
+    """
+    monthly, weekly, per_user = _aggregate(attempts)
+    _upsert_monthly(monthly)
+    _add_counts(WeeklyAttempts, 'week', weekly)
+
+    _upsert(UserScoreAverage, [
+        {'user_id': user_id, 'attempt_count': count, 'score_sum': total, 'avg_score': total / count}
+        for user_id, (count, total) in per_user.items()
+    ], lambda c, excluded: {
+        'attempt_count': c.attempt_count + excluded.attempt_count,
+        'score_sum': c.score_sum + excluded.score_sum,
+        'avg_score': (c.score_sum + excluded.score_sum) / (c.attempt_count + excluded.attempt_count),
+    })
+
+
+def _upsert_monthly(monthly):
+    _, least, greatest = _dialect_functions()
+    _upsert(MonthlyActivity, [
+        {
+            'user_id': user_id,
+            'month': month,
+            'attempt_count': count,
+            'score_sum': total,
+            'score_min': low,
+            'score_max': high,
+            'last_attempt': last,
+        }
+        for (user_id, month), (count, total, low, high, last) in monthly.items()
+    ], lambda c, excluded: {
+        'attempt_count': c.attempt_count + excluded.attempt_count,
+        'score_sum': c.score_sum + excluded.score_sum,
+        'score_min': least(func.coalesce(c.score_min, excluded.score_min), excluded.score_min),
+        'score_max': greatest(func.coalesce(c.score_max, excluded.score_max), excluded.score_max),
+        'last_attempt': greatest(func.coalesce(c.last_attempt, excluded.last_attempt),
+                                 excluded.last_attempt),
+    })
+
+
+def record_registration(created_at):
+    _add_counts(DailyRegistrations, 'day', {created_at.date(): 1})
+
+
+def attempts_for_quizzes(quiz_ids):
+    """
+    The (user_id, timestamp, total_scored) attempts of the given quizzes,
+    read before a delete cascades them away.
+    """
+    if not quiz_ids:
+        return []
+    return db.session.query(Score.user_id, Score.timestamp, Score.total_scored)\
+        .filter(Score.quiz_id.in_(quiz_ids), Score.timestamp.isnot(None)).all()
+
+
+def forget_attempts(attempts):
+    """
+    Take deleted attempts back out of the rollups in the caller's
+    transaction, after the Score rows are gone. Counts and sums are
+    decremented; the affected monthly rows are recomputed from the scores
+    that remain, since their min/max/last cannot be decremented.
+    """
+    if not attempts:
+        return
+    monthly, weekly, per_user = _aggregate(attempts)
+
+    weeks = WeeklyAttempts.__table__
+    db.session.execute(
+        update(weeks).where(weeks.c.week == bindparam('w'))
+        .values(count=weeks.c.count - bindparam('n')),
+        [{'w': week, 'n': n} for week, n in weekly.items()]
+    )
+    db.session.execute(delete(weeks).where(weeks.c.count <= 0))
+
+    averages = UserScoreAverage.__table__
+    count = averages.c.attempt_count - bindparam('n')
+    total = averages.c.score_sum - bindparam('s')
+    db.session.execute(
+        update(averages).where(averages.c.user_id == bindparam('u'))
+        .values(attempt_count=count, score_sum=total,
+                avg_score=case((count > 0, total / count), else_=0)),
+        [{'u': user_id, 'n': n, 's': s} for user_id, (n, s) in per_user.items()]
+    )
+    db.session.execute(delete(averages).where(averages.c.attempt_count <= 0))
+
+    activity = MonthlyActivity.__table__
+    db.session.execute(
+        delete(activity).where(activity.c.user_id == bindparam('u'), activity.c.month == bindparam('m')),
+        [{'u': user_id, 'm': month} for user_id, month in monthly]
+    )
+    remaining = db.session.query(Score.user_id, Score.timestamp, Score.total_scored).filter(
+        Score.user_id.in_({user_id for user_id, _ in monthly}),
+        Score.timestamp >= min(month for _, month in monthly)
+    )
+    recomputed, _, _ = _aggregate(
+        row for row in remaining if (row.user_id, month_of(row.timestamp)) in monthly
+    )
+    _upsert_monthly(recomputed)
+
+
+def forget_user(user_id, created_at):
+    """
+    Drop a deleted user's per-user rollup rows and their registration.
+    """
+    MonthlyActivity.query.filter_by(user_id=user_id).delete()
+    UserScoreAverage.query.filter_by(user_id=user_id).delete()
+    if created_at:
+        days = DailyRegistrations.__table__
+        db.session.execute(
+            update(days).where(days.c.day == created_at.date()).values(count=days.c.count - 1)
+        )
+        db.session.execute(delete(days).where(days.c.count <= 0))
+
+
+def rebuild_rollups():
+    """
+    Rebuild every activity rollup from the full User and Score history in
+    one streamed pass over each table.
+
+    This is a manual backfill: it holds one write transaction for the whole
+    scan, which on SQLite blocks every submit until it finishes. Deletes
+    keep the rollups current through forget_attempts() and forget_user().
+    """
+    for model in (MonthlyActivity, WeeklyAttempts, UserScoreAverage, DailyRegistrations):
+        model.query.delete()
+
+    batch = []
+    query = db.session.query(Score.user_id, Score.timestamp, Score.total_scored)\
+        .filter(Score.timestamp.isnot(None))\
+        .order_by(Score.user_id, Score.timestamp)
+    for row in query.yield_per(BACKFILL_BATCH_SIZE):
+        batch.append(row)
+        if len(batch) >= BACKFILL_BATCH_SIZE:
+            record_attempts(batch)
+            batch = []
+    record_attempts(batch)
+
+    days = {}
+    for (created_at,) in db.session.query(User.created_at)\
+            .filter(User.created_at.isnot(None)).yield_per(BACKFILL_BATCH_SIZE):
+        days[created_at.date()] = days.get(created_at.date(), 0) + 1
+    _add_counts(DailyRegistrations, 'day', days)
+
+    db.session.commit()
@@ -0,0 +1,113 @@
+import re
+
+from sqlalchemy import text
+
+from models import db, User, Subject, Chapter, Quiz, Question
+
+
+SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+# Only this many matches per kind (newest first) are ranked, so a term
+# found in a large share of the catalogue does not score every row it
+# appears in, and a big table cannot crowd a small one out of the ranking.
+MAX_RANKED_CANDIDATES = 2000
+# bm25 weights for the title and body columns.
+RANK_WEIGHTS = (10.0, 1.0)
+
+# Each indexed row gets rowid = kind * KIND_SPAN + id, so triggers can
+# update and delete entries by rowid instead of scanning the index, and
+# each kind is one contiguous rowid range a query can be limited to.
+KIND_SPAN = 2 ** 40
+SEARCH_SOURCES = {
+    'users': (1, 'user', User, 'new.email', "coalesce(new.full_name, '')"),
+    'subjects': (2, 'subject', Subject, 'new.name', "coalesce(new.description, '')"),
+    'chapters': (3, 'chapter', Chapter, 'new.name', "coalesce(new.description, '')"),
+    'quizzes': (4, 'quiz', Quiz, "coalesce(new.remarks, '')", "''"),
+    'questions': (5, 'question', Question, 'new.question_statement', "''"),
+}
+KINDS = {kind: name for name, (kind, *_rest) in SEARCH_SOURCES.items()}
+
+
+def search_ddl():
+    """
+    Statements creating the FTS5 index, the triggers that keep it in sync
+    with its source tables, and the initial population.
+    """
+    statements = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+        "title, body, tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        "INSERT INTO search_index (search_index, rank) VALUES "
+        f"('rank', 'bm25({', '.join(map(str, RANK_WEIGHTS))})')",
+        "DELETE FROM search_index",
+    ]
+    for name, (kind, table, model, title, body) in SEARCH_SOURCES.items():
+        rowid = f'{kind * KIND_SPAN} + new.id'
+        old_rowid = f'{kind * KIND_SPAN} + old.id'
+        values = f'{rowid}, {title}, {body}'
+        statements += [
+            f'DROP TRIGGER IF EXISTS search_{table}_ai',
+            f'DROP TRIGGER IF EXISTS search_{table}_au',
+            f'DROP TRIGGER IF EXISTS search_{table}_ad',
+            f'CREATE TRIGGER search_{table}_ai AFTER INSERT ON "{table}" BEGIN '
+            f'INSERT INTO search_index (rowid, title, body) VALUES ({values}); END',
+            f'CREATE TRIGGER search_{table}_au AFTER UPDATE ON "{table}" BEGIN '
+            f'DELETE FROM search_index WHERE rowid = {old_rowid}; '
+            f'INSERT INTO search_index (rowid, title, body) VALUES ({values}); END',
+            f'CREATE TRIGGER search_{table}_ad AFTER DELETE ON "{table}" BEGIN '
+            f'DELETE FROM search_index WHERE rowid = {old_rowid}; END',
+            f'INSERT INTO search_index (rowid, title, body) '
+            f'SELECT {values.replace("new.", "")} FROM "{table}"',
+        ]
+    return statements
+
+
+def match_expression(query):
+    """
+    Turn free text into an FTS5 prefix query: every token must match the
+    start of a word. Tokens are quoted so user input cannot inject syntax.
+    """
+    tokens = re.findall(r'\w+', query.lower())
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def clamp_limit(limit):
+    # SQLite treats a negative LIMIT as no limit at all.
+    return max(1, min(limit, MAX_SEARCH_LIMIT))
+
+
+def search(query, limit=SEARCH_LIMIT):
+    """
+    Ranked prefix search over users, subjects, chapters, quizzes and
+    questions. Returns {kind: [rows]} with at most `limit` hits overall,
+    ranked among the newest MAX_RANKED_CANDIDATES matches of each kind.
+    """
+    results = {name: [] for name in SEARCH_SOURCES}
+    expression = match_expression(query)
+    if not expression:
+        return results
+
+    # One bounded MATCH per kind, each limited to that kind's rowid range.
+    selects = ' UNION ALL '.join(
+        'SELECT * FROM (SELECT rowid, rank FROM search_index WHERE search_index MATCH :q '
+        f'AND rowid > {kind * KIND_SPAN} AND rowid < {(kind + 1) * KIND_SPAN} '
+        'ORDER BY rowid DESC LIMIT :candidates)'
+        for kind in KINDS
+    )
+    hits = db.session.execute(
+        text(f'SELECT rowid FROM ({selects}) ORDER BY rank LIMIT :limit'),
+        {'q': expression, 'candidates': MAX_RANKED_CANDIDATES, 'limit': clamp_limit(limit)}
+    ).scalars().all()
+
+    ranked = {name: [] for name in SEARCH_SOURCES}
+    for rowid in hits:
+        name = KINDS.get(rowid // KIND_SPAN)
+        if name:
+            ranked[name].append(rowid % KIND_SPAN)
+
+    for name, ids in ranked.items():
+        if not ids:
+            continue
+        model = SEARCH_SOURCES[name][2]
+        rows = {row.id: row for row in model.query.filter(model.id.in_(ids)).all()}
+        results[name] = [rows[i] for i in ids if i in rows]
+    return results
@@ -0,0 +1,49 @@
+import csv
+import io
+import json
+
+from flask import Response, stream_with_context
+
+
+STREAM_BATCH_SIZE = 1000
+STREAM_FORMATS = ('ndjson', 'csv')
+
+
+def stream_rows(query, serialize, fieldnames, fmt, filename):
+    """
+    Stream every row of `query` as NDJSON or CSV. Rows are fetched with
+    yield_per and written out in batches, so memory stays flat however
+    many rows match.
+    """
+    rows = query.yield_per(STREAM_BATCH_SIZE)
+
+    if fmt == 'ndjson':
+        def generate():
+            batch = []
+            for row in rows:
+                batch.append(json.dumps(serialize(row)))
+                if len(batch) >= STREAM_BATCH_SIZE:
+                    yield '\n'.join(batch) + '\n'
+                    batch = []
+            if batch:
+                yield '\n'.join(batch) + '\n'
+        mimetype = 'application/x-ndjson'
+    else:
+        def generate():
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction='ignore')
+            writer.writeheader()
+            for i, row in enumerate(rows, 1):
+                writer.writerow(serialize(row))
+                if i % STREAM_BATCH_SIZE == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+        mimetype = 'text/csv'
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}.{fmt}'}
+    )
@@ -0,0 +1,150 @@
+import json
+import uuid
+
+from cache import redis_client
+
+
+PENDING_QUEUE = 'submissions:pending'
+PROCESSING_QUEUE = 'submissions:processing'
+DEAD_LETTER_QUEUE = 'submissions:dead'
+BATCH_FAILURES_KEY = 'submissions:batch_failures'
+# After this many failed attempts at the head batch, ingestion stores its
+# records one at a time and dead-letters the ones that still fail.
+MAX_BATCH_FAILURES = 3
+INGEST_LOCK_KEY = 'submissions:ingest_lock'
+INGEST_LOCK_TIMEOUT = 5 * 60
+STATUS_TIMEOUT = 24 * 60 * 60
+FLUSH_DEBOUNCE = 1
+INGEST_BATCH_SIZE = 500
+
+
+def status_key(user_id, submission_key):
+    # Keys come from clients, so they are only unique per user.
+    return f'submission:{user_id}:{submission_key}'
+
+
+def new_submission_key():
+    return uuid.uuid4().hex
+
+
+def get_submission(user_id, submission_key):
+    """
+    Return the stored status record of a user's write-behind submission,
+    or None.
+    """
+    raw = redis_client.get(status_key(user_id, submission_key))
+    return json.loads(raw) if raw else None
+
+
+def enqueue_submission(record):
+    """
+    Queue a graded submission for write-behind persistence. Returns
+    (accepted, status): when the key was already seen, nothing is queued and
+    the existing status is returned so client retries stay idempotent.
+    """
+    status = dict(record, status='pending')
+    key = status_key(record['user_id'], record['submission_key'])
+    if not redis_client.set(key, json.dumps(status), nx=True, ex=STATUS_TIMEOUT):
+        return False, get_submission(record['user_id'], record['submission_key'])
+    redis_client.rpush(PENDING_QUEUE, json.dumps(record))
+    return True, status
+
+
+def should_schedule_flush():
+    """
+    True for at most one caller per debounce window, so a burst of submits
+    schedules one ingestion task instead of one per request.
+    """
+    return bool(redis_client.set('submissions:flush_scheduled', 1, nx=True, ex=FLUSH_DEBOUNCE))
+
+
+def take_batch(size=INGEST_BATCH_SIZE):
+    """
+    Atomically move up to `size` queued submissions onto the processing
+    list. Returns (raw, records); the raw entries are what ack_batch and
+    restore_batch need once the batch is committed or has failed.
+    """
+    pipe = redis_client.pipeline()
+    for _ in range(size):
+        pipe.lmove(PENDING_QUEUE, PROCESSING_QUEUE, 'LEFT', 'RIGHT')
+    raw = [r for r in pipe.execute() if r is not None]
+    return raw, [json.loads(r) for r in raw]
+
+
+def ack_batch(raw):
+    """
+    Drop a committed batch from the processing list.
+    """
+    if raw:
+        pipe = redis_client.pipeline()
+        for r in raw:
+            pipe.lrem(PROCESSING_QUEUE, 1, r)
+        pipe.execute()
+
+
+def restore_batch(raw):
+    """
+    Put a failed batch back at the head of the pending queue.
+    """
+    if raw:
+        pipe = redis_client.pipeline()
+        for r in raw:
+            pipe.lrem(PROCESSING_QUEUE, 1, r)
+        pipe.lpush(PENDING_QUEUE, *reversed(raw))
+        pipe.execute()
+
+
+def recover_processing():
+    """
+    Move entries left on the processing list by a crashed ingestion run back
+    to the pending queue. Only call this while holding the ingest lock.
+    """
+    moved = 0
+    while redis_client.lmove(PROCESSING_QUEUE, PENDING_QUEUE, 'RIGHT', 'LEFT') is not None:
+        moved += 1
+    return moved
+
+
+def ingest_lock():
+    """
+    A lease held by the single running ingestion task. It expires on its
+    own if the worker dies, after which recover_processing() reclaims the
+    batch the worker was writing.
+    """
+    return redis_client.lock(INGEST_LOCK_KEY, timeout=INGEST_LOCK_TIMEOUT, blocking=False)
+
+
+def batch_failed():
+    """
+    Count a failed attempt at storing the head batch; returns the count.
+    """
+    pipe = redis_client.pipeline()
+    pipe.incr(BATCH_FAILURES_KEY)
+    pipe.expire(BATCH_FAILURES_KEY, STATUS_TIMEOUT)
+    return pipe.execute()[0]
+
+
+def batch_stored():
+    redis_client.delete(BATCH_FAILURES_KEY)
+
+
+def dead_letter(record, error):
+    """
+    Park a submission that cannot be stored on the dead-letter list for an
+    operator, and mark it failed so the client stops waiting.
+    """
+    redis_client.rpush(DEAD_LETTER_QUEUE, json.dumps({'record': record, 'error': error}))
+    status = get_submission(record['user_id'], record['submission_key']) or dict(record)
+    status.update(status='failed')
+    redis_client.set(status_key(record['user_id'], record['submission_key']), json.dumps(status),
+                     ex=STATUS_TIMEOUT)
+
+
+def pending_count():
+    return redis_client.llen(PENDING_QUEUE)
+
+
+def mark_stored(user_id, submission_key, score_id):
+    status = get_submission(user_id, submission_key) or {'user_id': user_id, 'submission_key': submission_key}
+    status.update(status='stored', score_id=score_id)
+    redis_client.set(status_key(user_id, submission_key), json.dumps(status), ex=STATUS_TIMEOUT)
@@ -0,0 +1,124 @@
+import os
+import sys
+import tempfile
+
+import fakeredis
+import pytest
+import redis
+from sqlalchemy import event
+
+# The app reads DATABASE_URL and connects to redis at import time, so point
+# both at throwaway backends before anything imports it.
+_tmpdir = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmpdir, 'test.db')}"
+
+_redis_server = fakeredis.FakeServer()
+
+
+def _fake_from_url(url, **kwargs):
+    return fakeredis.FakeRedis(server=_redis_server)
+
+
+redis.from_url = _fake_from_url
+redis.Redis.from_url = classmethod(lambda cls, url, **kwargs: _fake_from_url(url))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import app as flask_app, setup_db  # noqa: E402
+from cache import redis_client  # noqa: E402
+from models import db  # noqa: E402
+from papers import _answer_keys  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    flask_app.config['TESTING'] = True
+    redis_client.flushall()
+    _answer_keys.clear()
+    with flask_app.app_context():
+        db.drop_all()
+        db.session.execute(db.text('DROP TABLE IF EXISTS schema_migrations'))
+        db.session.commit()
+    setup_db()
+    yield flask_app
+    with flask_app.app_context():
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def _token(client, email, password):
+    res = client.post('/api/auth/login', json={'email': email, 'password': password})
+    return {'Authorization': f"Bearer {res.get_json()['token']}"}
+
+
+@pytest.fixture
+def admin_headers(client):
+    return _token(client, 'admin@gmail.com', 'admin123')
+
+
+@pytest.fixture
+def user_headers(client):
+    client.post('/api/auth/signup', json={
+        'email': 'student@example.com', 'password': 'secret',
+        'full_name': 'Student', 'qualification': 'BSc', 'dob': '2000-01-01'
+    })
+    return _token(client, 'student@example.com', 'secret')
+
+
+@pytest.fixture
+def count_queries(app):
+    """
+    Collect the SQL statements run inside the returned context manager.
+    """
+    from contextlib import contextmanager
+
+    @contextmanager
+    def counter():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+
+    return counter
+
+
+@pytest.fixture
+def quiz(app):
+    """
+    A subject > chapter > quiz with three questions of four options each;
+    the first option of every question is correct.
+    """
+    from datetime import datetime
+    from models import Subject, Chapter, Quiz, Question, Option
+
+    with app.app_context():
+        subject = Subject(name='Physics', description='')
+        chapter = Chapter(subject=subject, name='Motion', description='')
+        quiz = Quiz(chapter=chapter, date_of_quiz=datetime(2025, 1, 1), time_duration=10, remarks='Kinematics')
+        for i in range(3):
+            question = Question(quiz=quiz, question_statement=f'Question {i}')
+            for j in range(4):
+                question.options.append(Option(text=f'Option {i}.{j}', is_correct=j == 0))
+        db.session.add(subject)
+        db.session.commit()
+        return {
+            'subject_id': subject.id,
+            'chapter_id': chapter.id,
+            'quiz_id': quiz.id,
+            'questions': [
+                {'id': q.id, 'correct': q.options[0].id, 'wrong': q.options[1].id}
+                for q in quiz.questions
+            ]
+        }
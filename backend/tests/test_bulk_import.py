@@ -0,0 +1,41 @@
+import pytest
+
+from models import Quiz
+
+
+def payload(quiz, **fields):
+    return dict({
+        'chapter_id': quiz['chapter_id'], 'date_of_quiz': '2025-03-01', 'time_duration': 20,
+        'remarks': 'Imported',
+        'questions': [{
+            'question_statement': 'Pick one',
+            'options': [{'text': 'Right', 'is_correct': True}, {'text': 'Wrong', 'is_correct': False}]
+        }]
+    }, **fields)
+
+
+def test_import_creates_quizzes(client, quiz, admin_headers):
+    res = client.post('/api/admin/quizzes/import', json=[payload(quiz)], headers=admin_headers)
+    assert res.status_code == 201, res.get_json()
+    with client.application.app_context():
+        assert Quiz.query.filter_by(remarks='Imported').count() == 1
+
+
+@pytest.mark.parametrize('fields, msg', [
+    ({'remarks': {'a': 1}}, 'remarks must be a string'),
+    ({'remarks': 5}, 'remarks must be a string'),
+    ({'time_duration': 1.5}, 'time_duration must be a positive integer'),
+    ({'time_duration': True}, 'time_duration must be a positive integer'),
+    ({'chapter_id': 1.0}, 'quiz_id and chapter_id must be integers'),
+])
+def test_bad_field_types_are_row_errors(client, quiz, admin_headers, fields, msg):
+    res = client.post('/api/admin/quizzes/import', json=[payload(quiz, **fields)], headers=admin_headers)
+    assert res.status_code == 400
+    assert {'row': 'quizzes[0]', 'msg': msg} in res.get_json()['errors']
+    with client.application.app_context():
+        assert Quiz.query.count() == 1
+
+
+def test_remarks_may_be_left_out(client, quiz, admin_headers):
+    res = client.post('/api/admin/quizzes/import', json=[payload(quiz, remarks=None)], headers=admin_headers)
+    assert res.status_code == 201, res.get_json()
@@ -0,0 +1,125 @@
+from cache import redis_client
+from catalogue import CACHE_STATS_KEY
+
+
+def read(client, path, headers):
+    """
+    GET `path` twice so the second read is served from a warm cache, and
+    return that body with its ETag (if the endpoint sends one).
+    """
+    client.get(path, headers=headers)
+    res = client.get(path, headers=headers)
+    assert res.status_code == 200
+    return res.get_json(), res.headers.get('ETag')
+
+
+def revalidate(client, path, headers, etag):
+    """
+    Re-fetch `path` the way a browser holding `etag` would.
+    """
+    res = client.get(path, headers=dict(headers, **{'If-None-Match': etag}))
+    assert res.status_code == 200, f'{path} answered 304 with stale data'
+    return res.get_json()
+
+
+def test_reads_are_cached(client, quiz, admin_headers):
+    redis_client.delete(CACHE_STATS_KEY)
+    read(client, '/api/admin/subjects?all=1', admin_headers)
+    stats = redis_client.hgetall(CACHE_STATS_KEY)
+    assert stats[b'admin_subjects:hit'] == b'1'
+    assert stats[b'admin_subjects:miss'] == b'1'
+
+
+def test_etag_answers_304_while_unchanged(client, quiz, user_headers):
+    _, etag = read(client, '/api/user/subjects', user_headers)
+    res = client.get('/api/user/subjects', headers=dict(user_headers, **{'If-None-Match': etag}))
+    assert res.status_code == 304
+
+
+def test_subject_rename(client, quiz, admin_headers, user_headers):
+    subject_id = quiz['subject_id']
+    _, subjects_etag = read(client, '/api/user/subjects', user_headers)
+    _, chapters_etag = read(client, f'/api/user/chapters/{subject_id}', user_headers)
+    read(client, '/api/admin/subjects?all=1', admin_headers)
+    read(client, '/api/admin/chapters?all=1', admin_headers)
+
+    res = client.put(f'/api/admin/subjects/{subject_id}', json={'name': 'Chemistry'}, headers=admin_headers)
+    assert res.status_code == 200
+
+    assert [s['name'] for s in revalidate(client, '/api/user/subjects', user_headers, subjects_etag)] == ['Chemistry']
+    chapters = revalidate(client, f'/api/user/chapters/{subject_id}', user_headers, chapters_etag)
+    assert [c['subject_name'] for c in chapters] == ['Chemistry']
+    assert [s['name'] for s in read(client, '/api/admin/subjects?all=1', admin_headers)[0]] == ['Chemistry']
+    assert [c['subject_name'] for c in read(client, '/api/admin/chapters?all=1', admin_headers)[0]] == ['Chemistry']
+
+
+def test_chapter_move(client, quiz, admin_headers, user_headers):
+    old_subject, chapter_id = quiz['subject_id'], quiz['chapter_id']
+    new_subject = client.post('/api/admin/subjects', json={'name': 'Maths'}, headers=admin_headers).get_json()['id']
+
+    _, old_etag = read(client, f'/api/user/chapters/{old_subject}', user_headers)
+    _, new_etag = read(client, f'/api/user/chapters/{new_subject}', user_headers)
+    read(client, f'/api/admin/chapters?subject_id={new_subject}', admin_headers)
+
+    res = client.put(f'/api/admin/chapters/{chapter_id}', json={'subject_id': new_subject}, headers=admin_headers)
+    assert res.status_code == 200
+
+    assert revalidate(client, f'/api/user/chapters/{old_subject}', user_headers, old_etag) == []
+    moved = revalidate(client, f'/api/user/chapters/{new_subject}', user_headers, new_etag)
+    assert [(c['id'], c['subject_name']) for c in moved] == [(chapter_id, 'Maths')]
+    admin = read(client, f'/api/admin/chapters?subject_id={new_subject}', admin_headers)[0]
+    assert [c['id'] for c in admin] == [chapter_id]
+
+
+def test_quiz_delete_cascades(client, quiz, admin_headers, user_headers):
+    quiz_id, chapter_id = quiz['quiz_id'], quiz['chapter_id']
+    question_id = quiz['questions'][0]['id']
+    listings = [
+        '/api/admin/quizzes?all=1',
+        '/api/admin/questions?all=1',
+        f'/api/admin/options?question_id={question_id}&all=1',
+        '/api/admin/question_bank',
+    ]
+    for path in listings:
+        assert read(client, path, admin_headers)[0]
+    _, quizzes_etag = read(client, f'/api/user/quizzes/{chapter_id}', user_headers)
+    _, paper_etag = read(client, f'/api/user/questions/{quiz_id}', user_headers)
+
+    assert client.delete(f'/api/admin/quizzes/{quiz_id}', headers=admin_headers).status_code == 200
+
+    for path in listings:
+        assert read(client, path, admin_headers)[0] == [], path
+    assert revalidate(client, f'/api/user/quizzes/{chapter_id}', user_headers, quizzes_etag) == []
+    assert revalidate(client, f'/api/user/questions/{quiz_id}', user_headers, paper_etag) == []
+
+
+def test_option_edit(client, quiz, admin_headers, user_headers):
+    quiz_id = quiz['quiz_id']
+    question = quiz['questions'][0]
+    options_path = f"/api/admin/options?question_id={question['id']}&all=1"
+    bank_path = f'/api/admin/question_bank?quiz_id={quiz_id}'
+    read(client, options_path, admin_headers)
+    read(client, bank_path, admin_headers)
+    _, paper_etag = read(client, f'/api/user/questions/{quiz_id}', user_headers)
+
+    # Reword the wrong option and make it the correct one.
+    res = client.put(f"/api/admin/options/{question['wrong']}",
+                     json={'text': 'Reworded', 'is_correct': True}, headers=admin_headers)
+    assert res.status_code == 200
+
+    def edited(options):
+        return [(o['text'], o['is_correct']) for o in options if o['id'] == question['wrong']]
+
+    assert edited(read(client, options_path, admin_headers)[0]) == [('Reworded', True)]
+    bank = read(client, bank_path, admin_headers)[0]
+    assert edited(next(q for q in bank if q['id'] == question['id'])['options']) == [('Reworded', True)]
+    paper = revalidate(client, f'/api/user/questions/{quiz_id}', user_headers, paper_etag)
+    texts = [o['text'] for q in paper if q['id'] == question['id'] for o in q['options']]
+    assert 'Reworded' in texts
+
+    # Grading reads the cached answer key, which must follow the edit too.
+    res = client.post('/api/user/submit_quiz', json={
+        'quiz_id': quiz_id,
+        'answers': [{'question_id': question['id'], 'selected_option_id': question['wrong']}]
+    }, headers=user_headers)
+    assert res.get_json()['correct_answers'] == 1
@@ -0,0 +1,72 @@
+from datetime import datetime
+
+from cache import redis_client
+from history import HISTORY_GENERATION_KEY, append_scores, get_history
+from models import db, Score, User
+
+
+def student_id():
+    return User.query.filter_by(email='student@example.com').one().id
+
+
+def submit(client, quiz, headers):
+    question = quiz['questions'][0]
+    res = client.post('/api/user/submit_quiz', json={
+        'quiz_id': quiz['quiz_id'],
+        'answers': [{'question_id': question['id'], 'selected_option_id': question['correct']}]
+    }, headers=headers)
+    assert res.status_code == 200
+
+
+def test_append_after_a_rebuild_that_saw_the_score(app, quiz, user_headers):
+    with app.app_context():
+        user_id = student_id()
+        # The submit commits...
+        score = Score(quiz_id=quiz['quiz_id'], user_id=user_id, timestamp=datetime.utcnow(), total_scored=50.0)
+        db.session.add(score)
+        db.session.commit()
+        # ...a concurrent reader misses and rebuilds, picking the score up...
+        assert [e[0] for e in get_history(user_id)] == [score.id]
+        # ...and only then does the submit add it to the cached history.
+        append_scores([score])
+
+        assert [e[0] for e in get_history(user_id)] == [score.id]
+
+
+def test_scores_page_lists_each_attempt_once(client, quiz, user_headers):
+    assert client.get('/api/user/scores?all=1', headers=user_headers).get_json() == []
+    submit(client, quiz, user_headers)
+    submit(client, quiz, user_headers)
+
+    scores = client.get('/api/user/scores?all=1', headers=user_headers).get_json()
+    assert len(scores) == 2
+    assert len({s['id'] for s in scores}) == 2
+    assert scores == sorted(scores, key=lambda s: s['id'])
+
+
+def test_creating_a_quiz_keeps_cached_histories(client, quiz, admin_headers, user_headers):
+    submit(client, quiz, user_headers)
+    client.get('/api/user/scores?all=1', headers=user_headers)
+    generation = redis_client.get(HISTORY_GENERATION_KEY)
+
+    res = client.post('/api/admin/quizzes', json={
+        'chapter_id': quiz['chapter_id'], 'date_of_quiz': '2025-02-01', 'time_duration': 10, 'remarks': 'New'
+    }, headers=admin_headers)
+    assert res.status_code == 201
+    assert redis_client.get(HISTORY_GENERATION_KEY) == generation
+
+
+def test_quiz_rename_and_delete_reach_cached_histories(client, quiz, admin_headers, user_headers):
+    submit(client, quiz, user_headers)
+    with client.application.app_context():
+        user_id = student_id()
+        assert [e[2] for e in get_history(user_id)] == ['Kinematics']
+
+    client.put(f"/api/admin/quizzes/{quiz['quiz_id']}", json={'remarks': 'Dynamics'}, headers=admin_headers)
+    with client.application.app_context():
+        assert [e[2] for e in get_history(user_id)] == ['Dynamics']
+
+    client.delete(f"/api/admin/quizzes/{quiz['quiz_id']}", headers=admin_headers)
+    with client.application.app_context():
+        assert get_history(user_id) == []
+    assert client.get('/api/user/scores?all=1', headers=user_headers).get_json() == []
@@ -0,0 +1,54 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+from migrations import run_migrations
+from models import db, Chapter, Option, Question, Quiz, Score, UserAnswer
+
+
+HOT_QUERIES = {
+    'scores by user': lambda: Score.query.filter_by(user_id=1),
+    'scores by user in a time window': lambda: Score.query.filter(
+        Score.user_id == 1, Score.timestamp >= datetime(2025, 1, 1), Score.timestamp < datetime(2025, 2, 1)
+    ),
+    'scores by quiz': lambda: Score.query.filter_by(quiz_id=1),
+    'answers by score': lambda: UserAnswer.query.filter_by(score_id=1),
+    'questions by quiz': lambda: Question.query.filter_by(quiz_id=1),
+    'options by question': lambda: Option.query.filter_by(question_id=1),
+    'chapters by subject': lambda: Chapter.query.filter_by(subject_id=1),
+    'quizzes by chapter': lambda: Quiz.query.filter_by(chapter_id=1),
+}
+
+
+def query_plan(query):
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    params = tuple(
+        value.isoformat(' ') if isinstance(value, datetime) else value
+        for value in (compiled.params[name] for name in compiled.positiontup)
+    )
+    with db.engine.connect() as conn:
+        rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', params).all()
+    return ' | '.join(row[-1] for row in rows)
+
+
+@pytest.mark.parametrize('name', HOT_QUERIES)
+def test_hot_query_uses_an_index(app, name):
+    with app.app_context():
+        plan = query_plan(HOT_QUERIES[name]())
+    assert 'USING INDEX' in plan or 'USING COVERING INDEX' in plan, f'{name}: {plan}'
+
+
+def test_migrations_index_an_existing_database(app):
+    # Simulate a database created before the indexes existed.
+    with app.app_context():
+        with db.engine.begin() as conn:
+            for index in ('ix_score_user_id_timestamp', 'ix_question_quiz_id', 'ix_option_question_id'):
+                conn.execute(text(f'DROP INDEX {index}'))
+            conn.execute(text('DELETE FROM schema_migrations'))
+        assert 'USING INDEX' not in query_plan(HOT_QUERIES['questions by quiz']())
+
+        assert 2 in run_migrations()
+        assert run_migrations() == []
+        for name in ('scores by user in a time window', 'questions by quiz', 'options by question'):
+            assert 'USING INDEX' in query_plan(HOT_QUERIES[name]()), name
@@ -0,0 +1,82 @@
+from datetime import datetime
+
+import leaderboard
+from cache import redis_client
+from leaderboard import board_key, rebuild_leaderboards, record_scores
+from models import db, Score, User
+
+
+def add_score(quiz_id, user_id, total):
+    score = Score(quiz_id=quiz_id, user_id=user_id, timestamp=datetime.utcnow(), total_scored=total)
+    db.session.add(score)
+    db.session.commit()
+    record_scores([score])
+    return score
+
+
+def student_id():
+    return User.query.filter_by(email='student@example.com').one().id
+
+
+def boards(client, headers, **params):
+    res = client.get('/api/user/leaderboard', query_string=params, headers=headers)
+    assert res.status_code == 200
+    return [(e['user_id'], e['score']) for e in res.get_json()['top']]
+
+
+def test_rebuild_keeps_a_best_recorded_during_the_swap(app, quiz, user_headers, monkeypatch):
+    with app.app_context():
+        user_id = student_id()
+        add_score(quiz['quiz_id'], user_id, 40.0)
+
+        # A submit lands after the rebuild read the scores but before it
+        # renames its boards into place.
+        scan_iter = redis_client.scan_iter
+
+        def submit_then_scan(*args, **kwargs):
+            add_score(quiz['quiz_id'], user_id, 90.0)
+            return scan_iter(*args, **kwargs)
+
+        monkeypatch.setattr(leaderboard.redis_client, 'scan_iter', submit_then_scan)
+        rebuild_leaderboards()
+        monkeypatch.undo()
+
+        for key in (board_key('quiz', quiz['quiz_id']), board_key('chapter', quiz['chapter_id']),
+                    board_key('global')):
+            assert redis_client.zscore(key, user_id) == 90.0, key
+
+
+def test_quiz_delete_leaves_the_boards(client, quiz, admin_headers, user_headers):
+    with client.application.app_context():
+        user_id = student_id()
+        add_score(quiz['quiz_id'], user_id, 100.0)
+        other = add_score(
+            client.post('/api/admin/quizzes', json={
+                'chapter_id': quiz['chapter_id'], 'date_of_quiz': '2025-02-01', 'time_duration': 10
+            }, headers=admin_headers).get_json()['id'],
+            user_id, 30.0
+        )
+    assert boards(client, user_headers) == [(user_id, 130.0)]
+
+    assert client.delete(f"/api/admin/quizzes/{quiz['quiz_id']}", headers=admin_headers).status_code == 200
+
+    assert boards(client, user_headers) == [(user_id, 30.0)]
+    assert boards(client, user_headers, scope='chapter', id=quiz['chapter_id']) == [(user_id, 30.0)]
+    assert boards(client, user_headers, scope='quiz', id=quiz['quiz_id']) == []
+    assert boards(client, user_headers, scope='quiz', id=other.quiz_id) == [(user_id, 30.0)]
+
+    assert client.delete(f"/api/admin/chapters/{quiz['chapter_id']}", headers=admin_headers).status_code == 200
+    assert boards(client, user_headers) == []
+    assert redis_client.keys('leaderboard:*') == []
+
+
+def test_user_delete_leaves_the_boards(client, quiz, admin_headers, user_headers):
+    with client.application.app_context():
+        user_id = student_id()
+        add_score(quiz['quiz_id'], user_id, 100.0)
+    assert boards(client, admin_headers) == [(user_id, 100.0)]
+
+    assert client.delete(f'/api/admin/users/{user_id}', headers=admin_headers).status_code == 200
+
+    assert boards(client, admin_headers) == []
+    assert boards(client, admin_headers, scope='quiz', id=quiz['quiz_id']) == []
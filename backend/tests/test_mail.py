@@ -0,0 +1,105 @@
+import socket
+import time
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from mail import DomainRateLimiter, SMTPPool, build_message
+
+
+class RecordingHandler:
+    """
+    Records (connection number, recipient) per delivered message, and can
+    drop the connection after a given number of messages.
+    """
+
+    def __init__(self, drop_after=None):
+        self.delivered = []
+        self.connections = 0
+        self.drop_after = drop_after
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        if not getattr(session, 'connection_number', None):
+            self.connections += 1
+            session.connection_number = self.connections
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.delivered.append((session.connection_number, envelope.rcpt_tos[0]))
+        if self.drop_after and len(self.delivered) == self.drop_after:
+            server.loop.call_soon(server.transport.close)
+        return '250 OK'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server():
+    controllers = []
+
+    def start(handler):
+        controller = Controller(handler, hostname='127.0.0.1', port=free_port())
+        controller.start()
+        controllers.append(controller)
+        return controller
+
+    yield start
+    for controller in controllers:
+        controller.stop()
+
+
+def messages(*recipients):
+    return [build_message(to, 'Subject', 'Body') for to in recipients]
+
+
+def test_batches_reuse_one_connection(smtp_server):
+    handler = RecordingHandler()
+    server = smtp_server(handler)
+    pool = SMTPPool(server.hostname, server.port, rate_limiter=DomainRateLimiter(rate=0))
+
+    assert pool.send_batch(messages(*[f'user{i}@example.com' for i in range(5)])) == 5
+    assert pool.send_batch(messages('late@example.com')) == 1
+    pool.close()
+
+    assert handler.connections == 1
+    assert [n for n, _ in handler.delivered] == [1] * 6
+
+
+def test_reconnects_once_when_the_server_drops_the_connection(smtp_server):
+    handler = RecordingHandler(drop_after=2)
+    server = smtp_server(handler)
+    pool = SMTPPool(server.hostname, server.port, rate_limiter=DomainRateLimiter(rate=0))
+
+    recipients = [f'user{i}@example.com' for i in range(4)]
+    assert pool.send_batch(messages(*recipients)) == 4
+    pool.close()
+
+    # Every message arrives exactly once; the last two over a new connection.
+    assert [to for _, to in handler.delivered] == recipients
+    assert [n for n, _ in handler.delivered] == [1, 1, 2, 2]
+    assert pool.batch_timings[-1]['failed'] == 0
+
+
+def test_domain_rate_limit(smtp_server):
+    handler = RecordingHandler()
+    server = smtp_server(handler)
+    pool = SMTPPool(server.hostname, server.port, rate_limiter=DomainRateLimiter(rate=20))
+
+    started = time.monotonic()
+    pool.send_batch(messages(*[f'user{i}@slow.example' for i in range(5)]))
+    same_domain = time.monotonic() - started
+
+    started = time.monotonic()
+    pool.send_batch(messages(*[f'user@domain{i}.example' for i in range(5)]))
+    distinct_domains = time.monotonic() - started
+    pool.close()
+
+    # Five messages to one domain at 20/s need at least four 50ms gaps.
+    assert same_domain >= 0.2
+    assert distinct_domains < 0.2
+    assert len(handler.delivered) == 10
@@ -0,0 +1,33 @@
+from sqlalchemy import text
+
+from migrations import run_migrations
+from models import db, DailyRegistrations, User
+from rollups import rebuild_rollups
+
+
+def registrations():
+    return {r.day: r.count for r in DailyRegistrations.query.all()}
+
+
+def test_registrations_match_a_rebuild(app, user_headers):
+    with app.app_context():
+        incremental = registrations()
+        assert sum(incremental.values()) == User.query.count() == 2
+        rebuild_rollups()
+        assert registrations() == incremental
+
+
+def test_users_without_created_at_are_backfilled(app, user_headers):
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text('UPDATE "user" SET created_at = NULL'))
+            conn.execute(text('DELETE FROM daily_registrations'))
+            conn.execute(text('DELETE FROM schema_migrations WHERE version = 7'))
+
+        assert run_migrations() == [7]
+        db.session.expire_all()
+        assert User.query.filter(User.created_at.is_(None)).count() == 0
+        incremental = registrations()
+        assert sum(incremental.values()) == 2
+        rebuild_rollups()
+        assert registrations() == incremental
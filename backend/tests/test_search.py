@@ -0,0 +1,44 @@
+from sqlalchemy import insert, text
+
+from migrations import run_migrations
+from models import db, Subject, Question
+from search import MAX_RANKED_CANDIDATES, search
+
+
+def counts(results):
+    return {name: len(rows) for name, rows in results.items()}
+
+
+def test_exact_title_survives_a_common_term(app, quiz):
+    with app.app_context():
+        subject = Subject(name='Thermodynamics', description='')
+        db.session.add(subject)
+        db.session.commit()
+        # Enough newer questions to fill the candidate window on their own.
+        db.session.execute(insert(Question), [
+            {'quiz_id': quiz['quiz_id'], 'question_statement': f'Question {i} on thermodynamics and heat'}
+            for i in range(MAX_RANKED_CANDIDATES + 500)
+        ])
+        db.session.commit()
+
+        results = search('thermodynamics')
+        assert [s.id for s in results['subjects']] == [subject.id]
+        assert counts(results)['questions'] == 19
+
+
+def test_index_follows_edits(app, quiz):
+    with app.app_context():
+        subject = db.session.get(Subject, quiz['subject_id'])
+        assert search('physics')['subjects'] == [subject]
+        subject.name = 'Astronomy'
+        db.session.commit()
+        assert search('physics')['subjects'] == []
+        assert search('astro')['subjects'] == [subject]
+
+
+def test_migration_reindexes_an_existing_database(app, quiz):
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text('DELETE FROM schema_migrations WHERE version = 6'))
+        assert run_migrations() == [6]
+        assert [s.id for s in search('physics')['subjects']] == [quiz['subject_id']]
@@ -0,0 +1,115 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from cache import redis_client
+from celery_app import ingest_submissions
+from models import Score, User
+from submissions import (
+    DEAD_LETTER_QUEUE, MAX_BATCH_FAILURES, PENDING_QUEUE, PROCESSING_QUEUE, enqueue_submission,
+    get_submission
+)
+
+
+def answers(quiz):
+    question = quiz['questions'][0]
+    return [{'question_id': question['id'], 'selected_option_id': question['correct']}]
+
+
+def student_id():
+    return User.query.filter_by(email='student@example.com').one().id
+
+
+def record(user_id, quiz_id, key, timestamp=None):
+    return {
+        'submission_key': key, 'user_id': user_id, 'quiz_id': quiz_id,
+        'timestamp': timestamp or datetime.utcnow().isoformat(),
+        'total_questions': 3, 'correct_answers': 1, 'total_scored': 100 / 3, 'answers': []
+    }
+
+
+@pytest.fixture
+def async_submissions(app, monkeypatch):
+    """
+    Submit through the write-behind queue, with ingestion run by the test
+    instead of a worker.
+    """
+    app.config['ASYNC_SUBMISSIONS'] = True
+    monkeypatch.setattr(ingest_submissions, 'apply_async', lambda *args, **kwargs: None)
+    monkeypatch.setattr(ingest_submissions, 'delay', lambda *args, **kwargs: None)
+    yield
+    app.config['ASYNC_SUBMISSIONS'] = False
+
+
+def test_sync_submit_with_a_repeated_key(client, quiz, user_headers):
+    body = {'quiz_id': quiz['quiz_id'], 'answers': answers(quiz), 'submission_id': 'abc'}
+    first = client.post('/api/user/submit_quiz', json=body, headers=user_headers)
+    again = client.post('/api/user/submit_quiz', json=body, headers=user_headers)
+
+    assert first.status_code == again.status_code == 200
+    assert again.get_json()['msg'] == 'Quiz already submitted'
+    with client.application.app_context():
+        assert Score.query.filter_by(submission_key='abc').count() == 1
+
+
+def test_async_enqueue_with_a_repeated_key(client, quiz, user_headers, async_submissions):
+    body = {'quiz_id': quiz['quiz_id'], 'answers': answers(quiz), 'submission_id': 'abc'}
+    first = client.post('/api/user/submit_quiz', json=body, headers=user_headers)
+    again = client.post('/api/user/submit_quiz', json=body, headers=user_headers)
+
+    assert first.status_code == again.status_code == 202
+    assert again.get_json()['msg'] == 'Quiz already submitted'
+    assert redis_client.llen(PENDING_QUEUE) == 1
+
+    ingest_submissions()
+    status = client.get('/api/user/submissions/abc', headers=user_headers).get_json()
+    assert status['status'] == 'stored'
+    with client.application.app_context():
+        assert Score.query.filter_by(submission_key='abc').count() == 1
+
+    # Once stored, a retry is answered from the Score row.
+    assert client.post('/api/user/submit_quiz', json=body, headers=user_headers).status_code == 200
+
+
+def test_ingest_skips_repeated_and_already_stored_keys(app, quiz, user_headers):
+    with app.app_context():
+        user_id = student_id()
+        enqueue_submission(record(user_id, quiz['quiz_id'], 'first'))
+        ingest_submissions()
+        first_id = Score.query.filter_by(submission_key='first').one().id
+
+        # The status keys expired, so the same keys are queued again, twice.
+        redis_client.flushall()
+        for key in ('first', 'second', 'second'):
+            redis_client.rpush(PENDING_QUEUE, json.dumps(record(user_id, quiz['quiz_id'], key)))
+        ingest_submissions()
+
+        assert Score.query.filter_by(submission_key='first').one().id == first_id
+        assert Score.query.filter_by(submission_key='second').count() == 1
+        assert get_submission(user_id, 'first')['score_id'] == first_id
+        assert redis_client.llen(PROCESSING_QUEUE) == 0
+
+
+def test_a_bad_record_is_dead_lettered_after_repeated_failures(app, quiz, user_headers):
+    with app.app_context():
+        user_id = student_id()
+        enqueue_submission(record(user_id, quiz['quiz_id'], 'good'))
+        enqueue_submission(record(user_id, quiz['quiz_id'], 'bad', timestamp='not a timestamp'))
+        enqueue_submission(record(user_id, quiz['quiz_id'], 'later'))
+
+        for _ in range(MAX_BATCH_FAILURES - 1):
+            with pytest.raises(ValueError):
+                ingest_submissions()
+            assert redis_client.llen(PENDING_QUEUE) == 3
+        ingest_submissions()
+
+        assert {s.submission_key for s in Score.query.all()} == {'good', 'later'}
+        dead = [json.loads(d) for d in redis_client.lrange(DEAD_LETTER_QUEUE, 0, -1)]
+        assert [d['record']['submission_key'] for d in dead] == ['bad']
+        assert get_submission(user_id, 'bad')['status'] == 'failed'
+        assert redis_client.llen(PENDING_QUEUE) == redis_client.llen(PROCESSING_QUEUE) == 0
+
+        # The next submission is no longer stuck behind it.
+        enqueue_submission(record(user_id, quiz['quiz_id'], 'next'))
+        assert ingest_submissions() == 'Ingested 1 submissions.'
@@ -0,0 +1,32 @@
+from models import db, Question, Option
+
+
+def add_questions(app, quiz_id, count):
+    with app.app_context():
+        for i in range(count):
+            question = Question(quiz_id=quiz_id, question_statement=f'Extra {i}')
+            question.options = [Option(text=f'Extra {i}.{j}', is_correct=j == 0) for j in range(4)]
+            db.session.add(question)
+        db.session.commit()
+
+
+def test_user_questions_is_not_n_plus_one(app, client, quiz, user_headers, count_queries):
+    add_questions(app, quiz['quiz_id'], 50)
+
+    with count_queries() as statements:
+        res = client.get(f"/api/user/questions/{quiz['quiz_id']}", headers=user_headers)
+
+    assert res.status_code == 200
+    assert len(res.get_json()) == 53
+    assert len(statements) <= 2, statements
+
+
+def test_user_questions_never_sends_is_correct(client, quiz, user_headers):
+    res = client.get(f"/api/user/questions/{quiz['quiz_id']}", headers=user_headers)
+
+    assert res.status_code == 200
+    assert b'is_correct' not in res.data
+    for question in res.get_json():
+        assert question['options']
+        for option in question['options']:
+            assert 'is_correct' not in option
@@ -0,0 +1,167 @@
+import bisect
+import json
+import re
+import threading
+import time
+import unicodedata
+
+from cache import redis_client
+from models import db, User
+
+
+TYPEAHEAD_LIMIT = 10
+MAX_TYPEAHEAD_LIMIT = 50
+# Upper bound on index entries inspected per lookup, so very short
+# prefixes stay cheap.
+SCAN_LIMIT = 5000
+CHANGE_STREAM = 'typeahead:user_changes'
+# Changes older than this are trimmed from the stream; a worker that has
+# not synced for half this long rebuilds instead of replaying.
+CHANGE_RETENTION = 24 * 60 * 60
+
+
+def normalize(value):
+    value = unicodedata.normalize('NFKD', value or '')
+    return ''.join(c for c in value if not unicodedata.combining(c)).lower()
+
+
+def tokens_for(email, full_name):
+    """
+    Index tokens for a user: the whole email, its local part and the words
+    in it, and name words. Domain parts are left out so "gmail" does not
+    match half the user base.
+    """
+    email = normalize(email)
+    local = email.split('@', 1)[0]
+    tokens = {email, local}
+    tokens.update(t for t in re.split(r'[^\w]+', local) if t)
+    tokens.update(t for t in re.split(r'[^\w]+', normalize(full_name)) if t)
+    return tokens
+
+
+def user_payload(user):
+    return {
+        'id': user.id,
+        'email': user.email,
+        'full_name': user.full_name,
+        'role': user.role,
+        'active': user.active,
+    }
+
+
+class UserPrefixIndex:
+    """
+    In-memory sorted (token, user_id) index for prefix lookups, kept in
+    step with other workers through a redis stream of user changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = []
+        self._users = {}
+        self._last_change = None
+        self._synced_at = 0
+
+    def _add(self, payload):
+        self._remove(payload['id'])
+        tokens = tokens_for(payload['email'], payload['full_name'])
+        self._users[payload['id']] = (tokens, payload)
+        for token in tokens:
+            bisect.insort(self._entries, (token, payload['id']))
+
+    def _remove(self, user_id):
+        existing = self._users.pop(user_id, None)
+        if not existing:
+            return
+        for token in existing[0]:
+            i = bisect.bisect_left(self._entries, (token, user_id))
+            if i < len(self._entries) and self._entries[i] == (token, user_id):
+                del self._entries[i]
+
+    def rebuild(self):
+        # Note the stream position first, so changes committed while the
+        # table is read are replayed (replays are idempotent).
+        last = redis_client.xrevrange(CHANGE_STREAM, count=1)
+        users = {}
+        entries = []
+        rows = db.session.query(User.id, User.email, User.full_name, User.role, User.active)\
+            .yield_per(5000)
+        for user_id, email, full_name, role, active in rows:
+            payload = {'id': user_id, 'email': email, 'full_name': full_name,
+                       'role': role, 'active': active}
+            tokens = tokens_for(email, full_name)
+            users[user_id] = (tokens, payload)
+            entries.extend((token, user_id) for token in tokens)
+        entries.sort()
+        with self._lock:
+            self._users = users
+            self._entries = entries
+            self._last_change = last[0][0] if last else b'0-0'
+            self._synced_at = time.time()
+
+    def sync(self):
+        """
+        Apply user changes published by any worker since the last sync.
+        """
+        if self._last_change is None or time.time() - self._synced_at > CHANGE_RETENTION / 2:
+            self.rebuild()
+            return
+        changes = redis_client.xrange(CHANGE_STREAM, min=b'(' + self._last_change)
+        with self._lock:
+            for change_id, fields in changes:
+                change = json.loads(fields[b'change'])
+                if change['op'] == 'delete':
+                    self._remove(change['id'])
+                else:
+                    self._add(change['user'])
+                self._last_change = change_id
+            self._synced_at = time.time()
+
+    def lookup(self, query, limit=TYPEAHEAD_LIMIT):
+        """
+        Up to `limit` users with a token starting with the first query
+        word and, for multi-word queries, tokens matching every other word.
+        """
+        words = [w for w in re.split(r'\s+', normalize(query).strip()) if w]
+        if not words:
+            return []
+        first, rest = words[0], words[1:]
+        results = []
+        seen = set()
+        with self._lock:
+            i = bisect.bisect_left(self._entries, (first, -1))
+            end = min(len(self._entries), i + SCAN_LIMIT)
+            while i < end and len(results) < limit:
+                token, user_id = self._entries[i]
+                i += 1
+                if not token.startswith(first):
+                    break
+                if user_id in seen:
+                    continue
+                seen.add(user_id)
+                tokens, payload = self._users[user_id]
+                if all(any(t.startswith(w) for t in tokens) for w in rest):
+                    results.append(payload)
+        return results
+
+
+user_index = UserPrefixIndex()
+
+
+def publish_user_change(user):
+    change = {'op': 'upsert', 'id': user.id, 'user': user_payload(user)}
+    _publish(change)
+
+
+def publish_user_delete(user_id):
+    _publish({'op': 'delete', 'id': user_id})
+
+
+def _publish(change):
+    min_id = int((time.time() - CHANGE_RETENTION) * 1000)
+    redis_client.xadd(CHANGE_STREAM, {'change': json.dumps(change)}, minid=min_id, approximate=True)
+
+
+def typeahead(query, limit=TYPEAHEAD_LIMIT):
+    user_index.sync()
+    return user_index.lookup(query, max(1, min(limit, MAX_TYPEAHEAD_LIMIT)))